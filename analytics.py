@@ -0,0 +1,394 @@
+import atexit
+import hashlib
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+
+import click
+from sqlalchemy import bindparam, delete, event, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app import app, db
+from models import Project, ProjectStat, Like, Comment
+from utils import start_periodic_task
+
+# Views, likes and comments are counted per project in hourly buckets.
+# Events are buffered in memory and written in one transaction per flush;
+# complete days are rolled up into daily buckets and old hourly ones dropped,
+# so the dashboard reads a few hundred pre-aggregated rows at most.
+
+HLL_PRECISION = 10  # 1024 one-byte registers, ~3% error
+HLL_REGISTERS = 1 << HLL_PRECISION
+# Flush early if a worker collects more buckets than this between flushes
+MAX_BUFFERED_BUCKETS = 5000
+
+
+class HyperLogLog:
+    """Fixed-size distinct-count sketch; merging two is a register-wise max."""
+
+    def __init__(self, registers=None):
+        self.registers = bytearray(registers or HLL_REGISTERS)
+
+    def add(self, value):
+        x = int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), 'big')
+        index = x >> (64 - HLL_PRECISION)
+        rest = x & ((1 << (64 - HLL_PRECISION)) - 1)
+        rank = (64 - HLL_PRECISION) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        if other is not None:
+            self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self):
+        m = HLL_REGISTERS
+        estimate = 0.7213 / (1 + 1.079 / m) * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Small-range correction (linear counting)
+            estimate = m * math.log(m / zeros)
+        return round(estimate)
+
+    def to_bytes(self):
+        return bytes(self.registers)
+
+    @classmethod
+    def from_bytes(cls, value):
+        return cls(value) if value else None
+
+
+class _Bucket:
+    def __init__(self):
+        self.views = 0
+        self.likes = 0
+        self.comments = 0
+        self.visitors = None
+
+    def add(self, views=0, likes=0, comments=0, visitors=None):
+        self.views += views
+        self.likes += likes
+        self.comments += comments
+        if visitors is not None:
+            self.visitors = (self.visitors or HyperLogLog()).merge(visitors)
+
+    def add_row(self, row):
+        self.add(row.views, row.likes, row.comments, HyperLogLog.from_bytes(row.visitors))
+
+    def as_dict(self):
+        return {
+            'views': self.views,
+            'likes': self.likes,
+            'comments': self.comments,
+            'visitors': self.visitors.count() if self.visitors else 0,
+        }
+
+
+_buffer = {}  # (project_id, hour) -> _Bucket
+_buffer_lock = threading.Lock()
+
+
+def _hour(when):
+    return when.replace(minute=0, second=0, microsecond=0)
+
+
+def _day(when):
+    return when.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def record(project_id, views=0, likes=0, comments=0, visitor=None, when=None):
+    """Count events for ``project_id`` in the current hour's bucket."""
+    visitors = None
+    if visitor is not None:
+        visitors = HyperLogLog()
+        visitors.add(visitor)
+
+    key = (project_id, _hour(when or datetime.now()))
+    with _buffer_lock:
+        _buffer.setdefault(key, _Bucket()).add(views, likes, comments, visitors)
+        buffered = len(_buffer)
+
+    if not app.config['ANALYTICS_FLUSH_INTERVAL'] or buffered >= MAX_BUFFERED_BUCKETS:
+        try:
+            flush_analytics()
+        except Exception:
+            logging.exception("Analytics flush failed")
+
+
+def _retry_on_conflict(f):
+    # Another worker may insert the same bucket first; the retry sees it
+    try:
+        return f()
+    except IntegrityError:
+        return f()
+
+
+def flush_analytics():
+    """Write the buffered events into the hourly buckets in one transaction.
+
+    Returns the number of buckets written. On failure the events go back
+    into the buffer for the next flush.
+    """
+    global _buffer
+    with _buffer_lock:
+        pending, _buffer = _buffer, {}
+    if not pending:
+        return 0
+
+    try:
+        return _retry_on_conflict(lambda: _write_hourly(pending))
+    except Exception:
+        with _buffer_lock:
+            for key, bucket in pending.items():
+                _buffer.setdefault(key, _Bucket()).add(
+                    bucket.views, bucket.likes, bucket.comments, bucket.visitors)
+        raise
+
+
+def _add_to_buckets(conn, granularity, buckets):
+    """Add ``buckets`` ({(project_id, bucket_start): _Bucket}) to the stored
+    ones of ``granularity``: counts are summed and sketches merged.
+
+    Returns the keys of existing hourly buckets that were already rolled up.
+    """
+    table = ProjectStat.__table__
+    existing = {
+        (row.project_id, row.bucket_start): row
+        for row in conn.execute(
+            select(table.c.id, table.c.project_id, table.c.bucket_start,
+                   table.c.visitors, table.c.rolled_up)
+            .where(table.c.granularity == granularity,
+                   table.c.project_id.in_({project_id for project_id, _ in buckets}),
+                   table.c.bucket_start.in_({start for _, start in buckets}))
+            .with_for_update()
+        )
+    }
+
+    inserts, updates, rolled_up = [], [], []
+    for (project_id, start), bucket in buckets.items():
+        row = existing.get((project_id, start))
+        if row is None:
+            inserts.append({
+                'project_id': project_id,
+                'granularity': granularity,
+                'bucket_start': start,
+                'views': bucket.views,
+                'likes': bucket.likes,
+                'comments': bucket.comments,
+                'visitors': bucket.visitors.to_bytes() if bucket.visitors else None,
+                'rolled_up': False,
+            })
+            continue
+        if row.rolled_up:
+            rolled_up.append((project_id, start))
+        visitors = HyperLogLog.from_bytes(row.visitors)
+        if bucket.visitors is not None:
+            visitors = (visitors or HyperLogLog()).merge(bucket.visitors)
+        updates.append({
+            'stat_id': row.id,
+            'add_views': bucket.views,
+            'add_likes': bucket.likes,
+            'add_comments': bucket.comments,
+            'merged_visitors': visitors.to_bytes() if visitors else None,
+        })
+
+    if updates:
+        conn.execute(
+            update(table)
+            .where(table.c.id == bindparam('stat_id'))
+            .values(views=table.c.views + bindparam('add_views'),
+                    likes=table.c.likes + bindparam('add_likes'),
+                    comments=table.c.comments + bindparam('add_comments'),
+                    visitors=bindparam('merged_visitors')),
+            updates
+        )
+    if inserts:
+        conn.execute(insert(table), inserts)
+    return rolled_up
+
+
+def _write_hourly(pending):
+    with db.engine.begin() as conn:
+        # Skip projects deleted since the events were recorded
+        existing_projects = set(conn.scalars(
+            select(Project.id).where(Project.id.in_({project_id for project_id, _ in pending}))
+        ))
+        buckets = {key: bucket for key, bucket in pending.items() if key[0] in existing_projects}
+        if not buckets:
+            return 0
+
+        rolled_up = _add_to_buckets(conn, 'hour', buckets)
+        if rolled_up:
+            # Late events for hours already counted in their day go there too
+            late = {}
+            for project_id, hour in rolled_up:
+                bucket = buckets[(project_id, hour)]
+                late.setdefault((project_id, _day(hour)), _Bucket()).add(
+                    bucket.views, bucket.likes, bucket.comments, bucket.visitors)
+            _add_to_buckets(conn, 'day', late)
+    return len(buckets)
+
+
+def roll_up_analytics(now=None):
+    """Add the hourly buckets of complete days to their daily buckets.
+
+    Each hourly bucket is added once and then flagged as rolled up; events
+    flushed later for such an hour are added to the day directly. Daily
+    buckets are therefore never rebuilt from partial data, and late flushes
+    or concurrent runs can't lose or double-count anything. Hourly buckets
+    older than ANALYTICS_HOURLY_RETENTION_DAYS are deleted afterwards.
+
+    Returns (daily buckets updated, hourly buckets deleted).
+    """
+    today = _day(now or datetime.now())
+    cutoff = today - timedelta(days=app.config['ANALYTICS_HOURLY_RETENTION_DAYS'])
+    return _retry_on_conflict(lambda: _roll_up(today, cutoff))
+
+
+def _roll_up(today, cutoff):
+    table = ProjectStat.__table__
+    with db.engine.begin() as conn:
+        rows = conn.execute(
+            select(table.c.id, table.c.project_id, table.c.bucket_start, table.c.views,
+                   table.c.likes, table.c.comments, table.c.visitors)
+            .where(table.c.granularity == 'hour',
+                   table.c.rolled_up.is_(False),
+                   table.c.bucket_start < today)
+            .with_for_update()
+        ).all()
+
+        days = {}
+        for row in rows:
+            days.setdefault((row.project_id, _day(row.bucket_start)), _Bucket()).add_row(row)
+        if days:
+            _add_to_buckets(conn, 'day', days)
+            conn.execute(
+                update(table).where(table.c.id.in_([row.id for row in rows])).values(rolled_up=True)
+            )
+
+        # Everything before the cutoff has been added to its day by now
+        deleted = conn.execute(
+            delete(table).where(table.c.granularity == 'hour', table.c.bucket_start < cutoff)
+        ).rowcount
+    return len(days), deleted
+
+
+def dashboard_analytics(days=30, hours=48, now=None):
+    """Series for the dashboard charts, read from the buckets only.
+
+    Days without a daily bucket yet (today, or before the next rollup) are
+    filled from their hourly buckets. Hours flushed after their day was
+    rolled up show in the daily bucket from the next rollup on.
+    """
+    now = now or datetime.now()
+    start = _day(now) - timedelta(days=days - 1)
+    first_hour = _hour(now) - timedelta(hours=hours - 1)
+    columns = (ProjectStat.project_id, ProjectStat.bucket_start, ProjectStat.views,
+               ProjectStat.likes, ProjectStat.comments, ProjectStat.visitors)
+
+    daily = db.session.execute(
+        select(*columns).where(ProjectStat.granularity == 'day', ProjectStat.bucket_start >= start)
+    ).all()
+    hourly = db.session.execute(
+        select(*columns).where(ProjectStat.granularity == 'hour',
+                               ProjectStat.bucket_start >= min(start, first_hour))
+    ).all()
+
+    rolled_up = {(row.project_id, row.bucket_start) for row in daily}
+    per_day, per_hour, per_project, total = {}, {}, {}, _Bucket()
+
+    def count(row, day):
+        per_day.setdefault(day, _Bucket()).add_row(row)
+        per_project.setdefault(row.project_id, _Bucket()).add_row(row)
+        total.add_row(row)
+
+    for row in daily:
+        count(row, row.bucket_start)
+    for row in hourly:
+        day = _day(row.bucket_start)
+        if day >= start and (row.project_id, day) not in rolled_up:
+            count(row, day)
+        if row.bucket_start >= first_hour:
+            per_hour.setdefault(row.bucket_start, _Bucket()).add_row(row)
+
+    day_keys = [start + timedelta(days=i) for i in range(days)]
+    hour_keys = [first_hour + timedelta(hours=i) for i in range(hours)]
+    empty = _Bucket()
+
+    top_ids = sorted(per_project, key=lambda project_id: per_project[project_id].views, reverse=True)[:5]
+    titles = dict(db.session.execute(
+        select(Project.id, Project.title).where(Project.id.in_(top_ids))
+    ).all()) if top_ids else {}
+
+    return {
+        'days': {
+            'labels': [day.strftime('%d/%m') for day in day_keys],
+            **{name: [per_day.get(day, empty).as_dict()[name] for day in day_keys]
+               for name in ('views', 'likes', 'comments', 'visitors')},
+        },
+        'hours': {
+            'labels': [hour.strftime('%H:00') for hour in hour_keys],
+            **{name: [per_hour.get(hour, empty).as_dict()[name] for hour in hour_keys]
+               for name in ('views', 'visitors')},
+        },
+        'totals': total.as_dict(),
+        'top_projects': [
+            {'title': titles.get(project_id, ''), **per_project[project_id].as_dict()}
+            for project_id in top_ids if project_id in titles
+        ],
+    }
+
+
+# Likes and comments are recorded once their transaction commits
+
+@event.listens_for(Session, 'after_flush')
+def _collect_engagement(session, flush_context):
+    for obj in session.new:
+        if isinstance(obj, (Like, Comment)):
+            session.info.setdefault('analytics_events', []).append(
+                (obj.project_id, 'likes' if isinstance(obj, Like) else 'comments')
+            )
+
+
+@event.listens_for(Session, 'after_commit')
+def _record_engagement(session):
+    for project_id, kind in session.info.pop('analytics_events', ()):
+        record(project_id, **{kind: 1})
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_engagement(session):
+    session.info.pop('analytics_events', None)
+
+
+def start_analytics_worker(flush_interval, rollup_interval):
+    """Flush buffered events every ``flush_interval`` seconds and roll up
+    hourly buckets every ``rollup_interval`` seconds, in a daemon thread."""
+    def flush_on_exit():
+        with app.app_context():
+            flush_analytics()
+
+    last_rollup = None
+
+    def flush_and_roll_up():
+        nonlocal last_rollup
+        flush_analytics()
+        if rollup_interval and (last_rollup is None or time.monotonic() - last_rollup >= rollup_interval):
+            last_rollup = time.monotonic()
+            rolled, deleted = roll_up_analytics()
+            if rolled or deleted:
+                logging.info(f"Rolled up {rolled} daily analytics bucket(s), dropped {deleted} hourly")
+
+    atexit.register(flush_on_exit)
+    return start_periodic_task('analytics', flush_interval, flush_and_roll_up, "Analytics flush/rollup")
+
+
+@app.cli.command('rollup-analytics')
+def rollup_analytics_command():
+    """Roll hourly analytics buckets up into daily ones."""
+    rolled, deleted = roll_up_analytics()
+    click.echo(f'Wrote {rolled} daily bucket(s), deleted {deleted} hourly bucket(s).')
@@ -1,23 +1,35 @@
 import os
 from flask import Flask
+from jinja2 import FileSystemBytecodeCache
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
 from werkzeug.middleware.proxy_fix import ProxyFix
 import logging
 
+from routing import RoutingSession, init_replicas
+
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
 
 class Base(DeclarativeBase):
     pass
 
-db = SQLAlchemy(model_class=Base)
+db = SQLAlchemy(model_class=Base, session_options={"class_": RoutingSession})
 
 # create the app
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET")
 app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1) # needed for url_for to generate with https
 
+# Persist compiled templates across worker restarts and deploys
+# (TEMPLATE_CACHE_DIR="" turns it off)
+template_cache_dir = os.environ.get("TEMPLATE_CACHE_DIR", os.path.join(app.instance_path, "jinja_cache"))
+if template_cache_dir:
+    os.makedirs(template_cache_dir, exist_ok=True)
+    app.jinja_options = {**app.jinja_options, "bytecode_cache": FileSystemBytecodeCache(template_cache_dir)}
+# Compile every template at startup instead of on first hit
+app.config['TEMPLATE_WARMUP'] = os.environ.get("TEMPLATE_WARMUP", "").lower() in ("1", "true")
+
 # configure the database, relative to the app instance folder
 # Railway PostgreSQL configuration
 database_url = os.environ.get("DATABASE_URL")
@@ -28,16 +40,53 @@ app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
     "pool_recycle": 300,
     "pool_pre_ping": True,
 }
+# Optional read replicas for GET traffic, comma-separated URLs
+app.config["DATABASE_REPLICA_URLS"] = os.environ.get("DATABASE_REPLICA_URLS")
 
 # File upload configuration
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 
+# Project media gallery: large files are sent in chunks below MAX_CONTENT_LENGTH
+app.config['MEDIA_CHUNK_SIZE'] = 8 * 1024 * 1024
+app.config['MEDIA_MAX_SIZE'] = int(os.environ.get("MEDIA_MAX_SIZE", 1024 * 1024 * 1024))  # 1GB
+app.config['MEDIA_PARTIAL_FOLDER'] = os.path.join(app.instance_path, 'partial_uploads')
+# Let the front server send media files: X-Sendfile (Apache/lighttpd) or an
+# nginx internal location prefix for X-Accel-Redirect, e.g. "/protected-media/"
+app.config['USE_X_SENDFILE'] = os.environ.get("USE_X_SENDFILE", "").lower() in ("1", "true")
+app.config['MEDIA_ACCEL_REDIRECT_PREFIX'] = os.environ.get("MEDIA_ACCEL_REDIRECT_PREFIX")
+
+# Max age (seconds) of the per-worker slug routing table
+app.config['SLUG_MAP_TTL'] = int(os.environ.get("SLUG_MAP_TTL", 300))
+
+# Periodic like/comment counter reconciliation (seconds, 0 disables it)
+app.config['COUNTER_RECONCILE_INTERVAL'] = int(os.environ.get("COUNTER_RECONCILE_INTERVAL", 0))
+
+# Read notifications older than this are rolled into daily digests
+app.config['NOTIFICATION_RETENTION_DAYS'] = int(os.environ.get("NOTIFICATION_RETENTION_DAYS", 30))
+app.config['NOTIFICATION_PRUNE_INTERVAL'] = int(os.environ.get("NOTIFICATION_PRUNE_INTERVAL", 0))
+
+# Server-Sent Events: each open stream holds a worker thread, so keep them
+# capped per worker and recycled (the browser reconnects on its own)
+app.config['LIVE_MAX_STREAMS'] = int(os.environ.get("LIVE_MAX_STREAMS", 4))
+app.config['LIVE_STREAM_TIMEOUT'] = int(os.environ.get("LIVE_STREAM_TIMEOUT", 300))
+
+# Analytics buckets: events are buffered per worker and written every
+# ANALYTICS_FLUSH_INTERVAL seconds (0 writes each one straight away);
+# hourly buckets are rolled up into daily ones and kept this many days
+app.config['ANALYTICS_FLUSH_INTERVAL'] = int(os.environ.get("ANALYTICS_FLUSH_INTERVAL", 30))
+app.config['ANALYTICS_ROLLUP_INTERVAL'] = int(os.environ.get("ANALYTICS_ROLLUP_INTERVAL", 3600))
+app.config['ANALYTICS_HOURLY_RETENTION_DAYS'] = int(os.environ.get("ANALYTICS_HOURLY_RETENTION_DAYS", 2))
+
 # initialize the app with the extension, flask-sqlalchemy >= 3.0.x
 db.init_app(app)
+init_replicas(app)
 
 with app.app_context():
     # Make sure to import the models here or their tables won't be created
     import models  # noqa: F401
     db.create_all()
     logging.info("Database tables created")
+
+    from migrations import run_migrations
+    run_migrations()
@@ -0,0 +1,85 @@
+"""Measure worker boot time and first-request latency.
+
+Each scenario runs in a fresh interpreter, like a freshly forked gunicorn
+worker, against a throwaway SQLite database:
+
+    python bench_startup.py [--runs 5]
+
+Scenarios:
+- no cache: templates compiled from source on first hit
+- bytecode cache: templates loaded from TEMPLATE_CACHE_DIR (already filled)
+- warm-up: TEMPLATE_WARMUP compiles everything during boot
+- cache + warm-up: both
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+WORKER = r"""
+import json, logging, time
+logging.disable(logging.CRITICAL)
+start = time.perf_counter()
+import main
+from app import app, db
+from models import Project
+booted = time.perf_counter()
+with app.app_context():
+    if not Project.query.filter_by(slug='bench').first():
+        db.session.add(Project(title='Bench', slug='bench', description='Bench',
+                               is_published=True))
+        db.session.commit()
+client = app.test_client()
+timings = {}
+for path in ('/', '/projetos', '/projeto/bench', '/sobre'):
+    t = time.perf_counter()
+    client.get(path)
+    timings[path] = time.perf_counter() - t
+print(json.dumps({'boot': booted - start, 'requests': timings}))
+"""
+
+
+def run_worker(env):
+    output = subprocess.run([sys.executable, '-c', WORKER], env=env, check=True,
+                            capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base_env = {
+            **os.environ,
+            'DATABASE_URL': f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+            'REPL_ID': os.environ.get('REPL_ID', 'bench'),
+            'SESSION_SECRET': 'bench',
+        }
+        cache_dir = os.path.join(tmp, 'jinja_cache')
+        scenarios = {
+            'no cache': {'TEMPLATE_CACHE_DIR': '', 'TEMPLATE_WARMUP': ''},
+            'bytecode cache': {'TEMPLATE_CACHE_DIR': cache_dir, 'TEMPLATE_WARMUP': ''},
+            'warm-up': {'TEMPLATE_CACHE_DIR': '', 'TEMPLATE_WARMUP': '1'},
+            'cache + warm-up': {'TEMPLATE_CACHE_DIR': cache_dir, 'TEMPLATE_WARMUP': '1'},
+        }
+
+        # Create the schema and fill the bytecode cache once
+        run_worker({**base_env, **scenarios['bytecode cache']})
+
+        print(f"{'scenario':<18}{'boot ms':>10}{'first / ms':>12}{'first req total ms':>20}")
+        for name, overrides in scenarios.items():
+            results = [run_worker({**base_env, **overrides}) for _ in range(args.runs)]
+            boot = statistics.median(r['boot'] for r in results) * 1000
+            first = statistics.median(r['requests']['/'] for r in results) * 1000
+            total = statistics.median(sum(r['requests'].values()) for r in results) * 1000
+            print(f"{name:<18}{boot:>10.1f}{first:>12.1f}{total:>20.1f}")
+
+
+if __name__ == '__main__':
+    main()
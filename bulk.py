@@ -0,0 +1,356 @@
+import csv
+import io
+import json
+import sys
+import time
+from datetime import datetime
+
+import click
+from sqlalchemy import delete, insert, select, update
+
+from app import app, db
+from models import Project, Category, ProjectMedia, Like, Comment, Notification, NotificationDigest, SlugHistory, ProjectStat
+from utils import create_slug
+from slugs import unique_slug, invalidate_slugs
+from content import derive_content
+from media import project_media_files, remove_media_files
+
+BATCH_SIZE = 1000
+
+# Columns exchanged by import/export. Relations are written by natural key
+# (category name, project slug) so files can move between databases.
+EXPORT_FIELDS = {
+    'categories': ['name', 'description', 'color', 'created_at'],
+    'projects': ['title', 'slug', 'description', 'content', 'image_url', 'demo_url',
+                 'github_url', 'technologies', 'category', 'is_featured',
+                 'is_published', 'created_at'],
+    'media': ['project', 'filename', 'original_filename', 'media_type',
+              'file_size', 'created_at'],
+}
+
+BULK_ACTIONS = {
+    'publish': {'is_published': True},
+    'unpublish': {'is_published': False},
+    'feature': {'is_featured': True},
+    'unfeature': {'is_featured': False},
+}
+
+
+def bulk_update_projects(project_ids, **values):
+    """Apply ``values`` to all given projects with a single UPDATE."""
+    if not project_ids:
+        return 0
+    result = db.session.execute(
+        update(Project)
+        .where(Project.id.in_(project_ids))
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def bulk_delete_projects(project_ids):
+    """Delete projects and their dependent rows with one statement per table.
+
+    Mirrors the ORM cascades of Project (likes, comments, media, slug
+    history, stats) and the nullified Notification.related_project_id,
+    without loading any rows. Gallery files are removed after the commit.
+    """
+    if not project_ids:
+        return 0
+    media_files = project_media_files(project_ids)
+    for model in (Like, Comment, ProjectMedia, SlugHistory, ProjectStat):
+        db.session.execute(delete(model).where(model.project_id.in_(project_ids)))
+    db.session.execute(
+        delete(NotificationDigest).where(NotificationDigest.related_project_id.in_(project_ids))
+    )
+    db.session.execute(
+        update(Notification)
+        .where(Notification.related_project_id.in_(project_ids))
+        .values(related_project_id=None)
+    )
+    result = db.session.execute(
+        delete(Project)
+        .where(Project.id.in_(project_ids))
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    invalidate_slugs()
+    remove_media_files(media_files)
+    return result.rowcount
+
+
+def _export_query(entity):
+    if entity == 'categories':
+        return select(Category.name, Category.description, Category.color,
+                      Category.created_at).order_by(Category.id)
+    if entity == 'projects':
+        return (
+            select(Project.title, Project.slug, Project.description, Project.content,
+                   Project.image_url, Project.demo_url, Project.github_url,
+                   Project.technologies, Category.name.label('category'),
+                   Project.is_featured, Project.is_published, Project.created_at)
+            .outerjoin(Category, Project.category_id == Category.id)
+            .order_by(Project.id)
+        )
+    if entity == 'media':
+        return (
+            select(Project.slug.label('project'), ProjectMedia.filename,
+                   ProjectMedia.original_filename, ProjectMedia.media_type,
+                   ProjectMedia.file_size, ProjectMedia.created_at)
+            .join(Project, ProjectMedia.project_id == Project.id)
+            .order_by(ProjectMedia.id)
+        )
+    raise ValueError(f"Unknown entity: {entity}")
+
+
+def _serialize(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def export_rows(entity, fmt):
+    """Yield an export of ``entity`` as CSV or JSON Lines, chunk by chunk.
+
+    Rows are fetched with yield_per so memory stays flat regardless of the
+    table size.
+    """
+    fields = EXPORT_FIELDS[entity]
+    result = db.session.execute(_export_query(entity).execution_options(yield_per=BATCH_SIZE))
+
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(fields)
+        for partition in result.partitions():
+            writer.writerows([_serialize(value) for value in row] for row in partition)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+    elif fmt == 'json':
+        for partition in result.partitions():
+            yield ''.join(
+                json.dumps({field: _serialize(value) for field, value in zip(fields, row)},
+                           ensure_ascii=False) + '\n'
+                for row in partition
+            )
+    else:
+        raise ValueError(f"Unknown format: {fmt}")
+
+
+def _read_records(stream, fmt):
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig')
+    if fmt == 'csv':
+        yield from csv.DictReader(text)
+    elif fmt == 'json':
+        for line in text:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        raise ValueError(f"Unknown format: {fmt}")
+
+
+def _parse_bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'sim', 'yes', 'on')
+    return bool(value)
+
+
+def _parse_datetime(value):
+    if not value:
+        return datetime.now()
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+
+def _parse_int(value):
+    return int(value) if value not in (None, '') else None
+
+
+def _batched(records, size=BATCH_SIZE):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _import_categories(records):
+    existing = set(db.session.scalars(select(Category.name)))
+    imported = 0
+    for batch in _batched(records):
+        rows = []
+        for record in batch:
+            name = (record.get('name') or '').strip()
+            if not name or name in existing:
+                continue
+            existing.add(name)
+            rows.append({
+                'name': name,
+                'description': record.get('description') or None,
+                'color': record.get('color') or '#6c757d',
+                'created_at': _parse_datetime(record.get('created_at')),
+            })
+        if rows:
+            db.session.execute(insert(Category), rows)
+            imported += len(rows)
+    return imported
+
+
+def _import_projects(records, new_ids=None):
+    """Insert projects; fills ``new_ids`` with source slug -> new id (None if ambiguous)."""
+    categories = dict(db.session.execute(select(Category.name, Category.id)).all())
+    # Current and old slugs are both reserved, old URLs must keep redirecting
+    slugs = set(db.session.scalars(select(Project.slug).where(Project.slug.isnot(None))))
+    slugs.update(db.session.scalars(select(SlugHistory.slug)))
+    next_suffix = {}
+    sources = {}
+    imported = 0
+    for batch in _batched(records):
+        rows = []
+        for record in batch:
+            title = (record.get('title') or '').strip()
+            if not title:
+                continue
+            source = create_slug(record.get('slug') or title) or 'projeto'
+            slug = unique_slug(source, slugs, next_suffix)
+            # Two records with one source slug: media can't tell them apart
+            sources[source] = None if source in sources else slug
+            rows.append({
+                'title': title,
+                'slug': slug,
+                'import_slug': source if slug != source else None,
+                'description': record.get('description') or '',
+                'content': record.get('content') or None,
+                'image_url': record.get('image_url') or None,
+                'demo_url': record.get('demo_url') or None,
+                'github_url': record.get('github_url') or None,
+                'technologies': record.get('technologies') or None,
+                'category_id': categories.get(record.get('category')),
+                'is_featured': _parse_bool(record.get('is_featured')),
+                'is_published': _parse_bool(record.get('is_published')),
+                'likes_count': 0,
+                'comments_count': 0,
+                'view_count': 0,
+                'created_at': _parse_datetime(record.get('created_at')),
+                'updated_at': datetime.now(),
+                **derive_content(record.get('description'), record.get('content'),
+                                 record.get('technologies')),
+            })
+        if rows:
+            db.session.execute(insert(Project), rows)
+            imported += len(rows)
+
+    if new_ids is not None:
+        new_slugs = [slug for slug in sources.values() if slug is not None]
+        ids = {}
+        for batch in _batched(new_slugs):
+            ids.update(db.session.execute(
+                select(Project.slug, Project.id).where(Project.slug.in_(batch))
+            ).all())
+        new_ids.update({source: ids.get(slug) for source, slug in sources.items()})
+    return imported
+
+
+def _import_media(records, projects=None):
+    """Insert media for ``projects`` (slug -> id), by default the current slugs.
+
+    Without a map, slugs that an import renamed (``foo`` came in as
+    ``foo-2``) are skipped: the file may mean either project.
+    """
+    if projects is None:
+        projects = dict(db.session.execute(select(Project.slug, Project.id)).all())
+        for slug in db.session.scalars(select(Project.import_slug).where(Project.import_slug.isnot(None))):
+            projects[slug] = None
+    imported = 0
+    for batch in _batched(records):
+        rows = []
+        for record in batch:
+            project_id = projects.get(record.get('project'))
+            if project_id is None or not record.get('filename'):
+                continue
+            rows.append({
+                'project_id': project_id,
+                'filename': record['filename'],
+                'original_filename': record.get('original_filename') or record['filename'],
+                'media_type': record.get('media_type') or 'image',
+                'file_size': _parse_int(record.get('file_size')),
+                'created_at': _parse_datetime(record.get('created_at')),
+            })
+        if rows:
+            db.session.execute(insert(ProjectMedia), rows)
+            imported += len(rows)
+    return imported
+
+
+IMPORTERS = {
+    'categories': _import_categories,
+    'projects': _import_projects,
+    'media': _import_media,
+}
+
+
+def import_rows(entity, stream, fmt):
+    """Import ``entity`` records from a CSV or JSON Lines byte stream.
+
+    Records are inserted in batches of BATCH_SIZE with executemany. Existing
+    categories are skipped by name, projects get a de-duplicated slug, and
+    media rows whose project slug is unknown or ambiguous are skipped.
+    Everything is committed at once, so a bad record leaves the database
+    untouched.
+    """
+    try:
+        imported = IMPORTERS[entity](_read_records(stream, fmt))
+        db.session.commit()
+        invalidate_slugs()
+    except Exception:
+        db.session.rollback()
+        raise
+    return imported
+
+
+def import_projects_with_media(project_stream, project_fmt, media_stream, media_fmt):
+    """Import projects and their media in one transaction.
+
+    Media is matched through the slugs in the projects file, so it lands on
+    the imported projects even when they were renamed. Returns both counts.
+    """
+    new_ids = {}
+    try:
+        projects = _import_projects(_read_records(project_stream, project_fmt), new_ids)
+        media = _import_media(_read_records(media_stream, media_fmt), new_ids)
+        db.session.commit()
+        invalidate_slugs()
+    except Exception:
+        db.session.rollback()
+        raise
+    return projects, media
+
+
+@app.cli.command('check-import-performance')
+@click.option('--rows', default=10000, show_default=True, help='Projects to import.')
+@click.option('--max-seconds', default=5.0, show_default=True, help='Fail above this time.')
+def check_import_performance_command(rows, max_seconds):
+    """Time a project import where every row has the same title (rolled back).
+
+    Identical titles are the worst case for slug de-duplication, so a
+    regression to per-row probing shows up here long before production.
+    """
+    records = [{'title': 'Projeto importado', 'description': 'Importado'} for _ in range(rows)]
+    try:
+        started = time.perf_counter()
+        imported = _import_projects(records)
+        elapsed = time.perf_counter() - started
+    finally:
+        db.session.rollback()
+
+    failed = elapsed > max_seconds
+    click.echo(f"{'SLOW' if failed else 'ok  '} {imported} projects in {elapsed:.2f}s (limit {max_seconds:.2f}s)")
+    sys.exit(1 if failed else 0)
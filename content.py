@@ -0,0 +1,177 @@
+import html
+import math
+import re
+from html.parser import HTMLParser
+
+ALLOWED_TAGS = {
+    'p', 'br', 'hr', 'strong', 'b', 'em', 'i', 'u', 's', 'span', 'div',
+    'h2', 'h3', 'h4', 'h5', 'h6', 'ul', 'ol', 'li', 'blockquote', 'code', 'pre',
+    'a', 'img', 'table', 'thead', 'tbody', 'tr', 'th', 'td',
+}
+ALLOWED_ATTRIBUTES = {
+    'a': {'href', 'title'},
+    'img': {'src', 'alt', 'title', 'width', 'height'},
+    'th': {'colspan', 'rowspan'},
+    'td': {'colspan', 'rowspan'},
+}
+URL_ATTRIBUTES = {'href', 'src'}
+ALLOWED_SCHEMES = {'http', 'https', 'mailto'}
+VOID_TAGS = {'br', 'hr', 'img'}
+# Dropped together with everything inside them
+DROP_CONTENT_TAGS = {'script', 'style', 'iframe', 'object', 'embed', 'template', 'noscript', 'svg', 'math'}
+
+EXCERPT_LENGTH = 160
+WORDS_PER_MINUTE = 200
+
+
+def _is_safe_url(url):
+    # Browsers ignore whitespace and control characters inside the scheme
+    cleaned = re.sub(r'[\x00-\x20]', '', html.unescape(url)).lower()
+    scheme = re.match(r'^([a-z][a-z0-9+.-]*):', cleaned)
+    return scheme is None or scheme.group(1) in ALLOWED_SCHEMES
+
+
+class _Sanitizer(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.output = []
+        self.open_tags = []
+        self.dropping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROP_CONTENT_TAGS:
+            self.dropping += 1
+            return
+        if self.dropping or tag not in ALLOWED_TAGS:
+            return
+
+        allowed = ALLOWED_ATTRIBUTES.get(tag, set())
+        parts = [tag]
+        for name, value in attrs:
+            if name not in allowed or value is None:
+                continue
+            if name in URL_ATTRIBUTES and not _is_safe_url(value):
+                continue
+            parts.append(f'{name}="{html.escape(value, quote=True)}"')
+        if tag == 'a':
+            parts.append('rel="noopener noreferrer nofollow"')
+
+        self.output.append(f"<{' '.join(parts)}>")
+        if tag not in VOID_TAGS:
+            self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS and self.open_tags and self.open_tags[-1] == tag:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in DROP_CONTENT_TAGS:
+            self.dropping = max(self.dropping - 1, 0)
+            return
+        if self.dropping or tag not in self.open_tags:
+            return
+        # Close anything left open inside this tag as well
+        while self.open_tags:
+            open_tag = self.open_tags.pop()
+            self.output.append(f'</{open_tag}>')
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if not self.dropping:
+            self.output.append(html.escape(data, quote=False))
+
+    def close(self):
+        super().close()
+        while self.open_tags:
+            self.output.append(f'</{self.open_tags.pop()}>')
+        return ''.join(self.output)
+
+
+class _TextExtractor(HTMLParser):
+    BLOCK_TAGS = {'p', 'br', 'div', 'li', 'h2', 'h3', 'h4', 'h5', 'h6', 'blockquote', 'pre', 'tr'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.BLOCK_TAGS:
+            self.parts.append(' ')
+
+    def handle_data(self, data):
+        self.parts.append(data)
+
+
+def sanitize_html(value):
+    """Keep only allow-listed tags, attributes and URL schemes."""
+    parser = _Sanitizer()
+    parser.feed(value or '')
+    return parser.close()
+
+
+def html_to_text(value):
+    parser = _TextExtractor()
+    parser.feed(value or '')
+    parser.close()
+    return re.sub(r'\s+', ' ', ''.join(parser.parts)).strip()
+
+
+def render_content(value):
+    """Turn the admin's content into safe HTML.
+
+    Content that already contains markup is sanitized as is; plain text is
+    split into paragraphs on blank lines, with single newlines kept as <br>.
+    """
+    value = (value or '').strip()
+    if not value:
+        return ''
+    if not re.search(r'</?[a-zA-Z][^>]*>', value):
+        paragraphs = re.split(r'\n\s*\n', value.replace('\r\n', '\n'))
+        value = ''.join(
+            '<p>' + html.escape(paragraph.strip()).replace('\n', '<br>') + '</p>'
+            for paragraph in paragraphs if paragraph.strip()
+        )
+    return sanitize_html(value)
+
+
+def make_excerpt(text, length=EXCERPT_LENGTH):
+    text = re.sub(r'\s+', ' ', text or '').strip()
+    if len(text) <= length:
+        return text
+    return text[:length].rsplit(' ', 1)[0].rstrip('.,;:') + '...'
+
+
+def reading_time(text):
+    """Estimated reading time in whole minutes (at least 1)."""
+    words = len((text or '').split())
+    return max(1, math.ceil(words / WORDS_PER_MINUTE))
+
+
+def parse_technologies(value):
+    """Split the comma-separated technologies field, dropping blanks and repeats."""
+    technologies = []
+    for tech in (value or '').split(','):
+        tech = tech.strip()
+        if tech and tech.lower() not in (t.lower() for t in technologies):
+            technologies.append(tech)
+    return technologies
+
+
+def derive_content(description, content, technologies):
+    """Compute the pre-rendered Project columns from the raw admin input."""
+    content_html = render_content(content)
+    content_text = html_to_text(content_html)
+    return {
+        'content_html': content_html,
+        'excerpt': make_excerpt(description or content_text),
+        'reading_time': reading_time(f'{description or ""} {content_text}'),
+        'technology_list': parse_technologies(technologies),
+    }
+
+
+def prepare_project(project):
+    """Refresh the derived content columns of ``project`` before saving."""
+    for name, value in derive_content(project.description, project.content, project.technologies).items():
+        setattr(project, name, value)
@@ -0,0 +1,123 @@
+import logging
+
+import click
+from sqlalchemy import and_, func, or_, select, update
+
+from app import app, db
+from models import Project, Like, Comment
+from utils import start_periodic_task
+
+
+def _actual_counts():
+    """Subquery with the real like/comment totals for every project.
+
+    Likes and approved comments are aggregated once with GROUP BY and
+    left-joined to the project table, so projects without any likes or
+    comments still show up with zero counts.
+    """
+    likes = (
+        select(Like.project_id, func.count().label('total'))
+        .group_by(Like.project_id)
+        .subquery('like_totals')
+    )
+    comments = (
+        select(Comment.project_id, func.count().label('total'))
+        .where(Comment.is_approved.is_(True))
+        .group_by(Comment.project_id)
+        .subquery('comment_totals')
+    )
+    projects = Project.__table__.alias('p')
+    return (
+        select(
+            projects.c.id.label('project_id'),
+            func.coalesce(likes.c.total, 0).label('likes_count'),
+            func.coalesce(comments.c.total, 0).label('comments_count'),
+        )
+        .select_from(projects)
+        .outerjoin(likes, likes.c.project_id == projects.c.id)
+        .outerjoin(comments, comments.c.project_id == projects.c.id)
+        .subquery('actual')
+    )
+
+
+def _drift_condition(actual):
+    return and_(
+        Project.id == actual.c.project_id,
+        or_(
+            Project.likes_count.is_distinct_from(actual.c.likes_count),
+            Project.comments_count.is_distinct_from(actual.c.comments_count),
+        ),
+    )
+
+
+def reconcile_counters(dry_run=False):
+    """Recompute likes_count/comments_count for all projects at once.
+
+    Returns a list of dicts describing every project whose stored counters
+    differed from the real totals. Unless ``dry_run`` is set, the drifted
+    rows are fixed with a single ``UPDATE ... FROM`` statement.
+    """
+    actual = _actual_counts()
+
+    drift = db.session.execute(
+        select(
+            Project.id,
+            Project.title,
+            Project.likes_count,
+            Project.comments_count,
+            actual.c.likes_count.label('actual_likes'),
+            actual.c.comments_count.label('actual_comments'),
+        ).where(_drift_condition(actual))
+    ).all()
+
+    report = [{
+        'project_id': row.id,
+        'title': row.title,
+        'likes_count': row.likes_count,
+        'actual_likes': row.actual_likes,
+        'comments_count': row.comments_count,
+        'actual_comments': row.actual_comments,
+    } for row in drift]
+
+    if report and not dry_run:
+        db.session.execute(
+            update(Project)
+            .where(_drift_condition(actual))
+            .values(likes_count=actual.c.likes_count,
+                    comments_count=actual.c.comments_count,
+                    # Counter fixes are not content edits
+                    updated_at=Project.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+    return report
+
+
+def start_counter_reconciler(interval):
+    """Run reconcile_counters every ``interval`` seconds in a daemon thread."""
+    def reconcile():
+        report = reconcile_counters()
+        if report:
+            logging.info(f"Reconciled counters for {len(report)} project(s)")
+
+    return start_periodic_task('counter-reconciler', interval, reconcile, "Counter reconciliation")
+
+
+@app.cli.command('reconcile-counters')
+@click.option('--dry-run', is_flag=True, help='Only report drift, do not fix it.')
+def reconcile_counters_command(dry_run):
+    """Recompute the denormalized like/comment counters."""
+    report = reconcile_counters(dry_run=dry_run)
+    for row in report:
+        click.echo(
+            f"#{row['project_id']} {row['title']}: "
+            f"likes {row['likes_count']} -> {row['actual_likes']}, "
+            f"comments {row['comments_count']} -> {row['actual_comments']}"
+        )
+    if not report:
+        click.echo('All counters are in sync.')
+    elif dry_run:
+        click.echo(f'{len(report)} project(s) drifted (dry run, nothing changed).')
+    else:
+        click.echo(f'{len(report)} project(s) fixed.')
@@ -0,0 +1,207 @@
+import itertools
+import json
+import queue
+import threading
+import time
+from collections import deque
+
+from flask import Response, current_app, request
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from models import Project, Notification
+
+ADMIN_CHANNEL = 'admin'
+HISTORY_SIZE = 50
+QUEUE_SIZE = 100
+HEARTBEAT_SECONDS = 15
+RETRY_MS = 3000
+# Sent to clients turned away when the worker is full
+BUSY_RETRY_MS = 30000
+
+
+def project_channel(project_id):
+    return f'project:{project_id}'
+
+
+class LocalBus:
+    """Stand-in for a cross-worker message bus.
+
+    Messages go straight to this process's listeners, so with several
+    gunicorn workers a client only sees events raised by its own worker.
+    A Redis pub/sub or Postgres LISTEN/NOTIFY bus with the same two methods
+    can replace it without touching the broker.
+    """
+
+    def __init__(self):
+        self._listeners = []
+
+    def subscribe(self, callback):
+        self._listeners.append(callback)
+
+    def publish(self, message):
+        for callback in self._listeners:
+            callback(message)
+
+
+class Broker:
+    """In-process pub/sub: one bounded queue per open stream.
+
+    The last few events of each channel are kept so a reconnecting
+    EventSource can catch up from its Last-Event-ID.
+    """
+
+    def __init__(self, bus):
+        self._subscribers = {}
+        self._history = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.bus = bus
+        bus.subscribe(self._deliver)
+
+    def publish(self, channel, event_name, data):
+        self.bus.publish({'channel': channel, 'event': event_name, 'data': data})
+
+    def _deliver(self, message):
+        channel = message['channel']
+        with self._lock:
+            message = {**message, 'id': next(self._ids)}
+            self._history.setdefault(channel, deque(maxlen=HISTORY_SIZE)).append(message)
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                # Stalled client: it gets the next snapshot, or reloads
+                pass
+
+    def subscribe(self, channel, last_event_id=None):
+        subscriber = queue.Queue(maxsize=QUEUE_SIZE)
+        with self._lock:
+            if last_event_id is not None:
+                for message in self._history.get(channel, ()):
+                    if message['id'] > last_event_id:
+                        subscriber.put_nowait(message)
+            self._subscribers.setdefault(channel, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, channel, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(channel)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[channel]
+
+    def stream_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+broker = Broker(LocalBus())
+
+
+def _format(message):
+    return f"id: {message['id']}\nevent: {message['event']}\ndata: {json.dumps(message['data'])}\n\n"
+
+
+def _stream(channel, last_event_id, timeout):
+    subscriber = broker.subscribe(channel, last_event_id)
+    try:
+        yield f'retry: {RETRY_MS}\n\n'
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                # Give the thread back; the browser reconnects with Last-Event-ID
+                return
+            try:
+                message = subscriber.get(timeout=min(HEARTBEAT_SECONDS, remaining))
+            except queue.Empty:
+                # Keeps proxies from closing the connection and notices gone clients
+                yield ': ping\n\n'
+                continue
+            yield _format(message)
+    finally:
+        broker.unsubscribe(channel, subscriber)
+
+
+def event_stream(channel):
+    """Server-Sent Events response for ``channel``.
+
+    The stream itself never touches the database, so the request's session
+    and connection are released before the first event is sent.
+    """
+    if broker.stream_count() >= current_app.config['LIVE_MAX_STREAMS']:
+        body = iter([f'retry: {BUSY_RETRY_MS}\n\n'])
+    else:
+        try:
+            last_event_id = int(request.headers.get('Last-Event-ID', ''))
+        except ValueError:
+            last_event_id = None
+        body = _stream(channel, last_event_id, current_app.config['LIVE_STREAM_TIMEOUT'])
+
+    return Response(body, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+
+# Events are collected during flush and only published once the transaction
+# commits, so clients never see counts or notifications that were rolled back.
+
+def _count_delta(state, name):
+    history = state.attrs[name].history
+    if not history.has_changes():
+        return 0
+    return (history.added[0] or 0) - ((history.deleted or [0])[0] or 0)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_events(session, flush_context):
+    pending = session.info.setdefault('live_events', {})
+
+    for obj in session.dirty:
+        if not isinstance(obj, Project):
+            continue
+        state = inspect(obj)
+        likes_delta = _count_delta(state, 'likes_count')
+        comments_delta = _count_delta(state, 'comments_count')
+        if not (likes_delta or comments_delta):
+            continue
+        key = ('counts', obj.id)
+        previous = pending.get(key, {'likes_delta': 0, 'comments_delta': 0})
+        pending[key] = {
+            'project_id': obj.id,
+            'likes_count': obj.likes_count,
+            'comments_count': obj.comments_count,
+            'likes_delta': previous['likes_delta'] + likes_delta,
+            'comments_delta': previous['comments_delta'] + comments_delta,
+        }
+
+    for obj in session.new:
+        if isinstance(obj, Notification):
+            pending[('notification', obj.id)] = {
+                'id': obj.id,
+                'title': obj.title,
+                'message': obj.message,
+                'type': obj.notification_type,
+                'project_id': obj.related_project_id,
+                'created_at': obj.created_at.strftime('%d/%m/%Y às %H:%M') if obj.created_at else '',
+            }
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_events(session):
+    pending = session.info.pop('live_events', None)
+    if not pending:
+        return
+    for (kind, _), data in pending.items():
+        if kind == 'counts':
+            broker.publish(project_channel(data['project_id']), 'counts', data)
+        broker.publish(ADMIN_CHANNEL, kind, data)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_events(session):
+    session.info.pop('live_events', None)
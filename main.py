@@ -1,6 +1,25 @@
 import os
+import logging
 from app import app
 import routes  # noqa: F401
+from counters import start_counter_reconciler
+from notifications import start_notification_pruner
+from analytics import start_analytics_worker
+import query_plans  # noqa: F401
+from utils import warm_templates
+
+if app.config['TEMPLATE_WARMUP']:
+    count, elapsed = warm_templates(app)
+    logging.info(f"Warmed up {count} templates in {elapsed * 1000:.1f}ms")
+
+if app.config['COUNTER_RECONCILE_INTERVAL']:
+    start_counter_reconciler(app.config['COUNTER_RECONCILE_INTERVAL'])
+
+if app.config['NOTIFICATION_PRUNE_INTERVAL']:
+    start_notification_pruner(app.config['NOTIFICATION_PRUNE_INTERVAL'])
+
+if app.config['ANALYTICS_FLUSH_INTERVAL']:
+    start_analytics_worker(app.config['ANALYTICS_FLUSH_INTERVAL'], app.config['ANALYTICS_ROLLUP_INTERVAL'])
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))
@@ -0,0 +1,214 @@
+import fcntl
+import json
+import os
+import shutil
+import time
+import uuid
+from contextlib import contextmanager
+
+import click
+from sqlalchemy import select
+from werkzeug.utils import secure_filename
+
+from app import app, db
+from models import ProjectMedia
+
+MEDIA_TYPES = {
+    'png': 'image', 'jpg': 'image', 'jpeg': 'image', 'gif': 'image', 'svg': 'image',
+    'mp4': 'video', 'webm': 'video',
+}
+
+COPY_BUFFER_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+def media_folder():
+    return os.path.join(app.config['UPLOAD_FOLDER'], 'media')
+
+
+def _partial_folder():
+    return app.config['MEDIA_PARTIAL_FOLDER']
+
+
+def _partial_paths(upload_id):
+    # upload_id comes from the URL, only accept what start_upload generates
+    if len(upload_id) != 32 or not all(c in '0123456789abcdef' for c in upload_id):
+        raise UploadError('Upload não encontrado.', status=404)
+    base = os.path.join(_partial_folder(), upload_id)
+    return base + '.json', base + '.part'
+
+
+def media_type_for(filename):
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return MEDIA_TYPES.get(extension)
+
+
+def start_upload(project_id, filename, size):
+    """Register a new resumable upload and return its state.
+
+    Upload state lives next to the partial file on disk, so any worker can
+    receive the next chunk and the upload survives restarts.
+    """
+    filename = secure_filename(filename or '')
+    if not filename or media_type_for(filename) is None:
+        raise UploadError('Tipo de arquivo não permitido.')
+    if not isinstance(size, int) or size <= 0:
+        raise UploadError('Tamanho de arquivo inválido.')
+    if size > app.config['MEDIA_MAX_SIZE']:
+        raise UploadError('Arquivo muito grande.', status=413)
+
+    upload_id = uuid.uuid4().hex
+    meta_path, part_path = _partial_paths(upload_id)
+    os.makedirs(_partial_folder(), exist_ok=True)
+    open(part_path, 'wb').close()
+    with open(meta_path, 'w') as f:
+        json.dump({'project_id': project_id, 'filename': filename, 'size': size}, f)
+
+    return upload_status(upload_id)
+
+
+def upload_status(upload_id):
+    meta_path, part_path = _partial_paths(upload_id)
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+    except FileNotFoundError:
+        raise UploadError('Upload não encontrado.', status=404)
+    return {
+        'upload_id': upload_id,
+        'offset': os.path.getsize(part_path),
+        'size': meta['size'],
+        'chunk_size': app.config['MEDIA_CHUNK_SIZE'],
+        **meta,
+    }
+
+
+@contextmanager
+def _locked_part(upload_id):
+    """Open the partial file with an exclusive lock, positioned at its end.
+
+    Serialises every request touching the same upload (e.g. a client retry
+    racing the original PUT), across threads and workers alike.
+    """
+    _, part_path = _partial_paths(upload_id)
+    try:
+        f = open(part_path, 'r+b')
+    except FileNotFoundError:
+        raise UploadError('Upload não encontrado.', status=404)
+    with f:
+        # Released when the file is closed
+        fcntl.flock(f, fcntl.LOCK_EX)
+        f.seek(0, os.SEEK_END)
+        yield f
+
+
+def write_chunk(upload_id, offset, stream):
+    """Append one chunk read from ``stream`` at ``offset``.
+
+    The chunk is copied to disk in small buffers, never held in memory as a
+    whole. A chunk whose offset does not match the bytes already received is
+    rejected with 409 and the current offset, so clients can resume after a
+    dropped connection. Returns the finished ProjectMedia on the last chunk,
+    otherwise the new upload state.
+    """
+    with _locked_part(upload_id) as f:
+        # Checked under the lock: another request may have just appended or
+        # finished the upload (then the state file is gone and this is a 404)
+        state = upload_status(upload_id)
+        if offset != state['offset']:
+            raise UploadError('Offset inválido.', status=409, offset=state['offset'])
+
+        remaining = state['size'] - offset
+        while remaining > 0:
+            data = stream.read(min(COPY_BUFFER_SIZE, remaining))
+            if not data:
+                break
+            f.write(data)
+            remaining -= len(data)
+        f.flush()
+
+        if remaining > 0:
+            return upload_status(upload_id)
+        return _finish_upload(upload_id, state)
+
+
+def _finish_upload(upload_id, state):
+    meta_path, part_path = _partial_paths(upload_id)
+    filename = f"{uuid.uuid4().hex}_{state['filename']}"
+    os.makedirs(media_folder(), exist_ok=True)
+    shutil.move(part_path, os.path.join(media_folder(), filename))
+    os.remove(meta_path)
+
+    media = ProjectMedia()
+    media.project_id = state['project_id']
+    media.filename = filename
+    media.original_filename = state['filename']
+    media.media_type = media_type_for(state['filename'])
+    media.file_size = state['size']
+    db.session.add(media)
+    db.session.commit()
+    return media
+
+
+def cancel_upload(upload_id):
+    try:
+        with _locked_part(upload_id):
+            for path in _partial_paths(upload_id):
+                if os.path.exists(path):
+                    os.remove(path)
+    except UploadError:
+        # Already finished or cancelled
+        pass
+
+
+def media_path(media):
+    return os.path.join(media_folder(), media.filename)
+
+
+def delete_media(media):
+    path = media_path(media)
+    db.session.delete(media)
+    db.session.commit()
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def project_media_files(project_ids):
+    """Filenames of the gallery files of the given projects.
+
+    Collect them before deleting the projects and pass them to
+    remove_media_files once the delete is committed.
+    """
+    return list(db.session.scalars(
+        select(ProjectMedia.filename).where(ProjectMedia.project_id.in_(project_ids))
+    ))
+
+
+def remove_media_files(filenames):
+    for filename in filenames:
+        path = os.path.join(media_folder(), filename)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+@app.cli.command('prune-uploads')
+@click.option('--hours', type=int, default=24, show_default=True,
+              help='Remove unfinished uploads idle for longer than this.')
+def prune_uploads_command(hours):
+    """Delete abandoned partial media uploads."""
+    folder = _partial_folder()
+    cutoff = time.time() - hours * 3600
+    removed = 0
+    if os.path.isdir(folder):
+        for name in os.listdir(folder):
+            path = os.path.join(folder, name)
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+    click.echo(f'{removed} file(s) removed.')
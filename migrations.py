@@ -0,0 +1,177 @@
+import logging
+from contextlib import contextmanager
+
+import click
+from sqlalchemy import bindparam, delete, func, inspect, select, text, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.schema import CreateIndex
+
+from app import app, db
+from models import SchemaMigration
+
+# db.create_all() only creates missing tables, so anything added to a table
+# that already exists in production (indexes, columns) is shipped as a
+# migration here. Migrations run in order, once, and must be idempotent
+# because several gunicorn workers may boot at the same time (on Postgres
+# they are also serialised with an advisory lock).
+MIGRATIONS = []
+# Arbitrary application-wide key for pg_advisory_lock
+MIGRATION_LOCK_KEY = 4_815_162_342
+
+
+def migration(f):
+    MIGRATIONS.append(f)
+    return f
+
+
+def _create_indexes(conn, *tables):
+    for table in tables:
+        for index in table.indexes:
+            conn.execute(CreateIndex(index, if_not_exists=True))
+
+
+@migration
+def add_hot_query_indexes(conn):
+    """Indexes for the listing, detail and dashboard queries."""
+    from models import Project, Comment, Like, Notification
+    _create_indexes(conn, Project.__table__, Comment.__table__,
+                    Like.__table__, Notification.__table__)
+
+
+@migration
+def add_project_media_index(conn):
+    """Gallery lookup for project_detail."""
+    from models import ProjectMedia
+    _create_indexes(conn, ProjectMedia.__table__)
+
+
+def _add_columns(conn, table, *columns):
+    existing = {column['name'] for column in inspect(conn).get_columns(table.name)}
+    for name in columns:
+        if name in existing:
+            continue
+        column = table.c[name]
+        column_type = column.type.compile(dialect=conn.dialect)
+        # SQLite has no IF NOT EXISTS here; the check above covers it
+        if_not_exists = ' IF NOT EXISTS' if conn.dialect.name == 'postgresql' else ''
+        conn.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN{if_not_exists} {name} {column_type}')
+
+
+@migration
+def add_prerendered_project_content(conn):
+    """Derived content columns, backfilled for existing projects."""
+    from models import Project
+    from content import derive_content
+    table = Project.__table__
+    _add_columns(conn, table, 'content_html', 'excerpt', 'reading_time', 'technology_list')
+
+    rows = conn.execute(select(table.c.id, table.c.description, table.c.content,
+                               table.c.technologies)).all()
+    if rows:
+        conn.execute(
+            update(table)
+            .where(table.c.id == bindparam('project_id'))
+            .values(updated_at=table.c.updated_at),
+            [{'project_id': row.id, **derive_content(row.description, row.content, row.technologies)}
+             for row in rows]
+        )
+
+
+@contextmanager
+def _migration_lock():
+    """Let one worker at a time run migrations (Postgres advisory lock).
+
+    The others wait, then find everything already recorded as applied.
+    """
+    if db.engine.dialect.name != 'postgresql':
+        yield
+        return
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        conn.execute(text('SELECT pg_advisory_lock(:key)'), {'key': MIGRATION_LOCK_KEY})
+        try:
+            yield
+        finally:
+            conn.execute(text('SELECT pg_advisory_unlock(:key)'), {'key': MIGRATION_LOCK_KEY})
+
+
+@migration
+def add_project_stat_rolled_up(conn):
+    """Flag hourly analytics buckets already counted in their daily bucket."""
+    from models import ProjectStat
+    table = ProjectStat.__table__
+    _add_columns(conn, table, 'rolled_up')
+    conn.execute(update(table).where(table.c.rolled_up.is_(None)).values(rolled_up=False))
+
+    # Daily buckets used to be rebuilt from the hourly ones, so any hour
+    # whose day already has a daily bucket is in it
+    days = set(conn.execute(
+        select(table.c.project_id, table.c.bucket_start).where(table.c.granularity == 'day')
+    ).tuples())
+    rolled_up = [
+        row.id for row in conn.execute(
+            select(table.c.id, table.c.project_id, table.c.bucket_start)
+            .where(table.c.granularity == 'hour')
+        )
+        if (row.project_id, row.bucket_start.replace(hour=0, minute=0, second=0, microsecond=0)) in days
+    ]
+    if rolled_up:
+        conn.execute(update(table).where(table.c.id.in_(rolled_up)).values(rolled_up=True))
+
+
+@migration
+def add_project_import_slug(conn):
+    """Source slug of imported projects that had to be renamed."""
+    from models import Project
+    _add_columns(conn, Project.__table__, 'import_slug')
+
+
+@migration
+def key_notification_digests_without_project(conn):
+    """Unique digest key that also covers rows without a project."""
+    from models import NotificationDigest
+    table = NotificationDigest.__table__
+    # Merge the duplicates the old NULL-blind constraint let through
+    duplicates = conn.execute(
+        select(table.c.day, table.c.notification_type,
+               func.min(table.c.id).label('keep_id'), func.sum(table.c.total).label('total'))
+        .where(table.c.related_project_id.is_(None))
+        .group_by(table.c.day, table.c.notification_type)
+        .having(func.count() > 1)
+    ).all()
+    for row in duplicates:
+        conn.execute(delete(table).where(
+            table.c.day == row.day, table.c.notification_type == row.notification_type,
+            table.c.related_project_id.is_(None), table.c.id != row.keep_id))
+        conn.execute(update(table).where(table.c.id == row.keep_id).values(total=row.total))
+
+    _create_indexes(conn, table)
+    # SQLite can't drop a table constraint; the new index is stricter anyway
+    if conn.dialect.name == 'postgresql':
+        conn.exec_driver_sql('ALTER TABLE notification_digest DROP CONSTRAINT IF EXISTS unique_notification_digest')
+
+
+def run_migrations():
+    """Apply every migration that is not recorded in schema_migration yet."""
+    with _migration_lock():
+        applied = {name for (name,) in db.session.query(SchemaMigration.name)}
+        db.session.rollback()
+
+        for f in MIGRATIONS:
+            if f.__name__ in applied:
+                continue
+            with db.engine.begin() as conn:
+                f(conn)
+            try:
+                db.session.add(SchemaMigration(name=f.__name__))
+                db.session.commit()
+                logging.info(f"Applied migration {f.__name__}")
+            except IntegrityError:
+                # Another worker recorded it first
+                db.session.rollback()
+
+
+@app.cli.command('migrate')
+def migrate_command():
+    """Apply pending schema migrations."""
+    run_migrations()
+    click.echo('Migrations up to date.')
@@ -59,6 +59,13 @@ class Project(db.Model):
     comments_count = db.Column(db.Integer, default=0)
     view_count = db.Column(db.Integer, default=0)
     slug = db.Column(db.String(250), unique=True)
+    import_slug = db.Column(db.String(250))  # Slug in the import file, when it was taken here
+
+    # Derived from description/content/technologies on save (see content.py)
+    content_html = db.Column(db.Text)  # Sanitized, rendered content
+    excerpt = db.Column(db.String(300))
+    reading_time = db.Column(db.Integer, default=1)  # Minutes
+    technology_list = db.Column(db.JSON)
     
     # Foreign keys
     category_id = db.Column(db.Integer, db.ForeignKey('category.id'))
@@ -70,6 +77,15 @@ class Project(db.Model):
     likes = db.relationship('Like', backref='project', lazy='dynamic', cascade='all, delete-orphan')
     comments = db.relationship('Comment', backref='project', lazy='dynamic', cascade='all, delete-orphan')
     media = db.relationship('ProjectMedia', backref='project', lazy='dynamic', cascade='all, delete-orphan')
+    slug_history = db.relationship('SlugHistory', backref='project', lazy='dynamic', cascade='all, delete-orphan')
+    stats = db.relationship('ProjectStat', backref='project', lazy='dynamic', cascade='all, delete-orphan')
+
+    __table_args__ = (
+        db.Index('ix_project_published_created', 'is_published', 'created_at'),
+        db.Index('ix_project_published_featured', 'is_published', 'is_featured', 'created_at'),
+        db.Index('ix_project_category_published_created', 'category_id', 'is_published', 'created_at'),
+        db.Index('ix_project_created_at', 'created_at'),
+    )
 
     def get_like_by_user(self, user_id):
         return self.likes.filter_by(user_id=user_id).first()
@@ -86,13 +102,27 @@ class ProjectMedia(db.Model):
     file_size = db.Column(db.Integer)
     created_at = db.Column(db.DateTime, default=datetime.now)
 
+    __table_args__ = (
+        db.Index('ix_project_media_project_created', 'project_id', 'created_at'),
+    )
+
+class SlugHistory(db.Model):
+    """Previous slugs of a project, kept so old URLs keep redirecting."""
+    id = db.Column(db.Integer, primary_key=True)
+    slug = db.Column(db.String(250), nullable=False, unique=True)
+    project_id = db.Column(db.Integer, db.ForeignKey('project.id', ondelete='CASCADE'), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+
 class Like(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.String, db.ForeignKey('users.id'), nullable=False)
     project_id = db.Column(db.Integer, db.ForeignKey('project.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.now)
 
-    __table_args__ = (UniqueConstraint('user_id', 'project_id', name='unique_user_project_like'),)
+    __table_args__ = (
+        UniqueConstraint('user_id', 'project_id', name='unique_user_project_like'),
+        db.Index('ix_like_project_id', 'project_id'),
+    )
 
 class Comment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -102,6 +132,11 @@ class Comment(db.Model):
     is_approved = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.now)
 
+    __table_args__ = (
+        db.Index('ix_comment_project_approved_created', 'project_id', 'is_approved', 'created_at'),
+        db.Index('ix_comment_created_at', 'created_at'),
+    )
+
 class AboutPage(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), default="Sobre Mim")
@@ -127,6 +162,50 @@ class Notification(db.Model):
     related_user_id = db.Column(db.String, db.ForeignKey('users.id'))
     created_at = db.Column(db.DateTime, default=datetime.now)
 
+    __table_args__ = (
+        db.Index('ix_notification_read_created', 'is_read', 'created_at'),
+    )
+
     # Relationships
     related_project = db.relationship('Project', backref='notifications')
     related_user = db.relationship('User', backref='notifications')
+
+class NotificationDigest(db.Model):
+    """Daily per-project rollup of read notifications removed by retention."""
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    notification_type = db.Column(db.String(50), nullable=False)
+    related_project_id = db.Column(db.Integer, db.ForeignKey('project.id', ondelete='CASCADE'))
+    total = db.Column(db.Integer, nullable=False, default=0)
+
+    related_project = db.relationship('Project')
+
+    __table_args__ = (
+        # NULLs never collide in a plain unique constraint, so site-wide
+        # digests (no project) are keyed on 0 instead
+        db.Index('unique_notification_digest_key', 'day', 'notification_type',
+                 db.text('coalesce(related_project_id, 0)'), unique=True),
+        db.Index('ix_notification_digest_day', 'day'),
+    )
+
+class ProjectStat(db.Model):
+    """Per-project engagement for one hour or one day (see analytics.py)."""
+    id = db.Column(db.Integer, primary_key=True)
+    project_id = db.Column(db.Integer, db.ForeignKey('project.id', ondelete='CASCADE'), nullable=False)
+    granularity = db.Column(db.String(5), nullable=False)  # hour, day
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    views = db.Column(db.Integer, nullable=False, default=0)
+    likes = db.Column(db.Integer, nullable=False, default=0)
+    comments = db.Column(db.Integer, nullable=False, default=0)
+    visitors = db.Column(db.LargeBinary)  # HyperLogLog registers
+    rolled_up = db.Column(db.Boolean, default=False)  # Hourly: already added to its day
+
+    __table_args__ = (
+        UniqueConstraint('project_id', 'granularity', 'bucket_start', name='unique_project_stat_bucket'),
+        db.Index('ix_project_stat_granularity_bucket', 'granularity', 'bucket_start'),
+    )
+
+class SchemaMigration(db.Model):
+    __tablename__ = 'schema_migration'
+    name = db.Column(db.String(200), primary_key=True)
+    applied_at = db.Column(db.DateTime, default=datetime.now)
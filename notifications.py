@@ -0,0 +1,128 @@
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+
+import click
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app import app, db
+from models import Notification, NotificationDigest
+from utils import start_periodic_task
+
+
+def mark_notifications_read(ids=None):
+    """Mark the given notifications (or all of them) as read in one UPDATE.
+
+    Returns the number of notifications that changed.
+    """
+    stmt = update(Notification).where(Notification.is_read.is_(False))
+    if ids is not None:
+        if not ids:
+            return 0
+        stmt = stmt.where(Notification.id.in_(ids))
+    result = db.session.execute(
+        stmt.values(is_read=True).execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def _add_to_digest(day, notification_type, project_id, count):
+    """Add ``count`` to a daily digest in SQL, creating it if needed."""
+    increment = (
+        update(NotificationDigest)
+        .where(NotificationDigest.day == day,
+               NotificationDigest.notification_type == notification_type,
+               NotificationDigest.related_project_id == project_id)
+        .values(total=NotificationDigest.total + count)
+        .execution_options(synchronize_session=False)
+    )
+    if db.session.execute(increment).rowcount:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.execute(insert(NotificationDigest).values(
+                day=day, notification_type=notification_type,
+                related_project_id=project_id, total=count))
+    except IntegrityError:
+        # Another worker created it in the meantime
+        db.session.execute(increment)
+
+
+def _roll_up_chunk(ids):
+    """Delete one chunk of notifications and fold what was deleted into the digests.
+
+    Counting the rows DELETE ... RETURNING removed (rather than the ones
+    selected) means a chunk another worker already pruned adds nothing.
+    """
+    deleted = db.session.execute(
+        delete(Notification)
+        .where(Notification.id.in_(ids))
+        .returning(Notification.created_at, Notification.notification_type,
+                   Notification.related_project_id)
+        .execution_options(synchronize_session=False)
+    ).all()
+
+    totals = Counter(
+        (row.created_at.date(), row.notification_type, row.related_project_id)
+        for row in deleted
+    )
+    for (day, notification_type, project_id), count in totals.items():
+        _add_to_digest(day, notification_type, project_id, count)
+    return len(deleted)
+
+
+def prune_notifications(retention_days=None, batch_size=1000):
+    """Roll read notifications older than the retention window into digests.
+
+    Originals are deleted in chunks of ``batch_size``; each chunk is folded
+    into NotificationDigest and deleted in the same transaction so a crash
+    never loses or double-counts a notification. Several workers can run
+    this at once: chunks are locked (skipping ones another worker holds, on
+    Postgres), only rows actually deleted are counted and digest totals are
+    incremented in SQL. Unread notifications are always kept. Returns the
+    number of notifications removed.
+    """
+    if retention_days is None:
+        retention_days = app.config['NOTIFICATION_RETENTION_DAYS']
+    cutoff = datetime.now() - timedelta(days=retention_days)
+
+    removed = 0
+    while True:
+        ids = db.session.scalars(
+            select(Notification.id)
+            .where(Notification.is_read.is_(True), Notification.created_at < cutoff)
+            .order_by(Notification.created_at)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ).all()
+
+        if not ids:
+            db.session.commit()
+            break
+
+        removed += _roll_up_chunk(ids)
+        db.session.commit()
+
+    return removed
+
+
+def start_notification_pruner(interval):
+    """Run prune_notifications every ``interval`` seconds in a daemon thread."""
+    def prune():
+        removed = prune_notifications()
+        if removed:
+            logging.info(f"Rolled up {removed} old notification(s)")
+
+    return start_periodic_task('notification-pruner', interval, prune, "Notification pruning")
+
+
+@app.cli.command('prune-notifications')
+@click.option('--days', type=int, default=None,
+              help='Keep read notifications newer than this many days.')
+@click.option('--batch-size', type=int, default=1000, show_default=True)
+def prune_notifications_command(days, batch_size):
+    """Roll old read notifications into daily per-project digests."""
+    removed = prune_notifications(retention_days=days, batch_size=batch_size)
+    click.echo(f'{removed} notification(s) rolled up.')
@@ -0,0 +1,77 @@
+import sys
+
+import click
+from sqlalchemy import desc, text
+
+from app import app, db
+from models import Project, Comment, Like, Notification, SlugHistory
+
+# The queries index, projects, project_detail and admin_dashboard run on
+# every request. Keep them in sync with routes.py when those change.
+HOT_QUERIES = {
+    'index: featured projects': lambda: Project.query.filter_by(
+        is_published=True, is_featured=True).limit(3),
+    'index: recent projects': lambda: Project.query.filter_by(
+        is_published=True).order_by(desc(Project.created_at)).limit(6),
+    'projects: listing': lambda: Project.query.filter_by(
+        is_published=True).order_by(desc(Project.created_at)).limit(12),
+    'projects: listing by category': lambda: Project.query.filter_by(
+        is_published=True, category_id=1).order_by(desc(Project.created_at)).limit(12),
+    # slugs.lookup_project: by id from the slug map, then by current slug,
+    # then through the slug history (the map itself is rebuilt per TTL)
+    'project_detail: project by id': lambda: Project.query.filter_by(
+        id=1, is_published=True).limit(1),
+    'project_detail: project by slug': lambda: Project.query.filter_by(
+        slug='slug', is_published=True).limit(1),
+    'project_detail: project by old slug': lambda: Project.query.filter_by(
+        is_published=True).join(SlugHistory, SlugHistory.project_id == Project.id).filter(
+        SlugHistory.slug == 'slug').limit(1),
+    'project_detail: comments': lambda: Comment.query.filter_by(
+        project_id=1, is_approved=True).order_by(desc(Comment.created_at)),
+    'project_detail: user like': lambda: Like.query.filter_by(
+        project_id=1, user_id='user').limit(1),
+    'admin_dashboard: published count': lambda: Project.query.filter_by(
+        is_published=True),
+    'admin_dashboard: recent comments': lambda: Comment.query.order_by(
+        desc(Comment.created_at)).limit(5),
+    'admin_dashboard: recent projects': lambda: Project.query.order_by(
+        desc(Project.created_at)).limit(5),
+    'admin_dashboard: unread notifications': lambda: Notification.query.filter_by(
+        is_read=False).order_by(desc(Notification.created_at)).limit(10),
+}
+
+
+def explain(query):
+    """Return the SQLite query plan of ``query`` as a list of detail strings."""
+    compiled = query.statement.compile(db.engine, compile_kwargs={'literal_binds': True})
+    rows = db.session.execute(text(f'EXPLAIN QUERY PLAN {compiled}')).all()
+    return [row[-1] for row in rows]
+
+
+def is_table_scan(detail):
+    # "SCAN project USING INDEX ..." walks an index in order, a bare
+    # "SCAN project" reads the whole table.
+    return detail.startswith('SCAN') and 'INDEX' not in detail
+
+
+def check_query_plans():
+    """Map each hot query name to (plan, uses_index)."""
+    results = {}
+    for name, build in HOT_QUERIES.items():
+        plan = explain(build())
+        results[name] = (plan, not any(is_table_scan(d) for d in plan))
+    return results
+
+
+@app.cli.command('check-query-plans')
+def check_query_plans_command():
+    """Fail if a hot query falls back to a table scan (SQLite only)."""
+    if db.engine.dialect.name != 'sqlite':
+        click.echo('EXPLAIN QUERY PLAN checks require a SQLite DATABASE_URL.')
+        sys.exit(2)
+
+    failed = False
+    for name, (plan, uses_index) in check_query_plans().items():
+        click.echo(f"{'ok  ' if uses_index else 'SCAN'} {name}: {'; '.join(plan)}")
+        failed = failed or not uses_index
+    sys.exit(1 if failed else 0)
@@ -18,6 +18,7 @@ from werkzeug.local import LocalProxy
 
 from app import app, db
 from models import OAuth, User
+from routing import use_primary
 
 login_manager = LoginManager(app)
 
@@ -130,6 +131,8 @@ def save_user(user_claims):
     # Set admin status - since this is your personal portfolio, you are always admin
     user.is_admin = True  # Auto-grant admin access to the portfolio owner
     
+    # The OAuth callback is a GET; merge must see the primary's row
+    use_primary()
     merged_user = db.session.merge(user)
     db.session.commit()
     return merged_user
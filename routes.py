@@ -1,15 +1,28 @@
 import os
-from flask import session, render_template, request, redirect, url_for, flash, jsonify, current_app
+from flask import session, render_template, request, redirect, url_for, flash, jsonify, current_app, Response, stream_with_context, send_file, abort
 from flask_login import current_user
 from werkzeug.utils import secure_filename
-from sqlalchemy import desc, func
+from sqlalchemy import desc, func, update
+from sqlalchemy.orm.attributes import set_committed_value
 import uuid
+import mimetypes
 from urllib.parse import quote
 
 from app import app, db
+from routing import use_primary
 from replit_auth import require_login, make_replit_blueprint, require_admin
 from models import User, Project, Category, Like, Comment, AboutPage, Notification, ProjectMedia
-from utils import allowed_file, create_slug, create_notification
+from utils import allowed_file, create_notification
+from content import prepare_project
+from slugs import lookup_project, assign_slug
+from notifications import mark_notifications_read
+from live import ADMIN_CHANNEL, project_channel, event_stream
+from analytics import record, dashboard_analytics
+from media import UploadError, start_upload, upload_status, write_chunk, cancel_upload, delete_media, media_path, project_media_files, remove_media_files
+from bulk import BULK_ACTIONS, bulk_update_projects, bulk_delete_projects, export_rows, import_rows, import_projects_with_media
+
+# URL names of the entities available for import/export
+TRANSFER_ENTITIES = {'categorias': 'categories', 'projetos': 'projects', 'midias': 'media'}
 
 app.register_blueprint(make_replit_blueprint(), url_prefix="/auth")
 
@@ -18,6 +31,14 @@ app.register_blueprint(make_replit_blueprint(), url_prefix="/auth")
 def make_session_permanent():
     session.permanent = True
 
+def visitor_id():
+    """Stable id of the current visitor for unique-visitor counts."""
+    if current_user.is_authenticated:
+        return f'user:{current_user.id}'
+    if 'visitor_id' not in session:
+        session['visitor_id'] = uuid.uuid4().hex
+    return session['visitor_id']
+
 @app.route('/')
 def index():
     # Get featured projects and recent projects
@@ -52,25 +73,41 @@ def projects():
 
 @app.route('/projeto/<slug>')
 def project_detail(slug):
-    project = Project.query.filter_by(slug=slug, is_published=True).first_or_404()
-    
-    # Increment view count
-    project.view_count += 1
-    db.session.commit()
+    project = lookup_project(slug, is_published=True)
+    if project is None:
+        abort(404)
+    if project.slug != slug:
+        return redirect(url_for('project_detail', slug=project.slug), 301)
+    
+    # Increment view count on its own primary connection: going through the
+    # session would pin the rest of this request to the primary
+    with db.engine.begin() as conn:
+        conn.execute(
+            update(Project).where(Project.id == project.id).values(view_count=Project.view_count + 1)
+        )
+    set_committed_value(project, 'view_count', (project.view_count or 0) + 1)
+    record(project.id, views=1, visitor=visitor_id())
     
     # Get comments
     comments = Comment.query.filter_by(project_id=project.id, is_approved=True).order_by(desc(Comment.created_at)).all()
     
+    # Get media gallery
+    media = project.media.order_by(ProjectMedia.created_at).all()
+    
     # Check if current user liked this project
     user_liked = False
     if current_user.is_authenticated:
         user_liked = project.is_liked_by_user(current_user.id)
     
-    return render_template('project_detail.html', project=project, comments=comments, user_liked=user_liked)
+    return render_template('project_detail.html', project=project, comments=comments, user_liked=user_liked, media=media)
 
 @app.route('/sobre')
 def about():
     about = AboutPage.query.first()
+    if not about:
+        # Make sure it's really missing, not just behind on a replica
+        use_primary()
+        about = AboutPage.query.first()
     if not about:
         # Create default about page
         about = AboutPage()
@@ -148,7 +185,6 @@ def add_comment(project_id):
     
     db.session.add(comment)
     project.comments_count += 1
-    db.session.commit()
     
     # Create notification for admin
     create_notification(
@@ -159,13 +195,43 @@ def add_comment(project_id):
         related_user_id=current_user.id
     )
     
+    db.session.commit()
+    
     flash('Comentário adicionado com sucesso!', 'success')
     return redirect(url_for('project_detail', slug=project.slug))
 
+# Live like/comment counts (Server-Sent Events)
+@app.route('/projeto/<int:project_id>/eventos')
+def project_events(project_id):
+    project = Project.query.filter_by(id=project_id, is_published=True).first_or_404()
+    return event_stream(project_channel(project.id))
+
+# Serve gallery media (supports Range requests for video seeking)
+@app.route('/midia/<int:media_id>')
+def serve_media(media_id):
+    media = ProjectMedia.query.get_or_404(media_id)
+    if not media.project.is_published and not (current_user.is_authenticated and current_user.is_admin):
+        abort(404)
+    path = media_path(media)
+    if not os.path.isfile(path):
+        # Row without its file (e.g. imported from another server)
+        abort(404)
+    
+    accel_prefix = current_app.config['MEDIA_ACCEL_REDIRECT_PREFIX']
+    if accel_prefix:
+        # nginx serves the file (and its ranges) from an internal location
+        response = Response(mimetype=mimetypes.guess_type(media.filename)[0])
+        response.headers['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + quote(media.filename)
+        return response
+    
+    return send_file(os.path.abspath(path), conditional=True, max_age=86400)
+
 # Share on LinkedIn
 @app.route('/projeto/<slug>/compartilhar')
 def share_linkedin(slug):
-    project = Project.query.filter_by(slug=slug, is_published=True).first_or_404()
+    project = lookup_project(slug, is_published=True)
+    if project is None:
+        abort(404)
     
     # Create LinkedIn share URL
     project_url = url_for('project_detail', slug=project.slug, _external=True)
@@ -194,6 +260,9 @@ def admin_dashboard():
     # Get unread notifications
     unread_notifications = Notification.query.filter_by(is_read=False).order_by(desc(Notification.created_at)).limit(10).all()
     
+    # Trends from the pre-aggregated analytics buckets
+    analytics = dashboard_analytics()
+    
     return render_template('admin/dashboard.html',
                          total_projects=total_projects,
                          published_projects=published_projects,
@@ -203,7 +272,8 @@ def admin_dashboard():
                          total_users=total_users,
                          recent_comments=recent_comments,
                          recent_projects=recent_projects,
-                         unread_notifications=unread_notifications)
+                         unread_notifications=unread_notifications,
+                         analytics=analytics)
 
 @app.route('/admin/projetos')
 @require_admin
@@ -212,7 +282,8 @@ def admin_projects():
     projects = Project.query.order_by(desc(Project.created_at)).paginate(
         page=page, per_page=20, error_out=False
     )
-    return render_template('admin/projects.html', projects=projects)
+    categories = Category.query.all()
+    return render_template('admin/projects.html', projects=projects, categories=categories)
 
 @app.route('/admin/projeto/novo')
 @require_admin
@@ -225,7 +296,8 @@ def admin_new_project():
 def admin_edit_project(project_id):
     project = Project.query.get_or_404(project_id)
     categories = Category.query.all()
-    return render_template('admin/project_form.html', project=project, categories=categories)
+    media = project.media.order_by(ProjectMedia.created_at).all()
+    return render_template('admin/project_form.html', project=project, categories=categories, media=media)
 
 @app.route('/admin/projeto/salvar', methods=['POST'])
 @require_admin
@@ -238,6 +310,7 @@ def admin_save_project():
         project = Project()
         db.session.add(project)
     
+    title_changed = request.form.get('title', '').strip() != project.title
     project.title = request.form.get('title', '').strip()
     project.description = request.form.get('description', '').strip()
     project.content = request.form.get('content', '').strip()
@@ -248,9 +321,12 @@ def admin_save_project():
     project.is_featured = 'is_featured' in request.form
     project.is_published = 'is_published' in request.form
     
-    # Generate slug if new project
-    if not project_id:
-        project.slug = create_slug(project.title)
+    # Generate a unique slug for new projects or when the title changed
+    if not project_id or title_changed:
+        assign_slug(project)
+    
+    # Pre-render content, excerpt, reading time and technologies
+    prepare_project(project)
     
     # Handle file upload
     if 'image' in request.files:
@@ -280,10 +356,12 @@ def admin_save_project():
 @require_admin
 def admin_delete_project(project_id):
     project = Project.query.get_or_404(project_id)
+    media_files = project_media_files([project.id])
     
     try:
         db.session.delete(project)
         db.session.commit()
+        remove_media_files(media_files)
         flash('Projeto excluído com sucesso!', 'success')
     except Exception as e:
         db.session.rollback()
@@ -291,10 +369,146 @@ def admin_delete_project(project_id):
     
     return redirect(url_for('admin_projects'))
 
+@app.route('/admin/projetos/lote', methods=['POST'])
+@require_admin
+def admin_bulk_projects():
+    action = request.form.get('action')
+    project_ids = request.form.getlist('project_ids', type=int)
+    
+    if not project_ids:
+        flash('Selecione ao menos um projeto.', 'error')
+        return redirect(request.referrer or url_for('admin_projects'))
+    
+    try:
+        if action in BULK_ACTIONS:
+            count = bulk_update_projects(project_ids, **BULK_ACTIONS[action])
+        elif action == 'category':
+            count = bulk_update_projects(project_ids, category_id=request.form.get('category_id', type=int))
+        elif action == 'delete':
+            count = bulk_delete_projects(project_ids)
+        else:
+            flash('Ação inválida.', 'error')
+            return redirect(request.referrer or url_for('admin_projects'))
+        flash(f'{count} projeto(s) atualizado(s) com sucesso!', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash('Erro ao atualizar projetos. Tente novamente.', 'error')
+    
+    return redirect(request.referrer or url_for('admin_projects'))
+
+@app.route('/admin/exportar/<entity>.<fmt>')
+@require_admin
+def admin_export(entity, fmt):
+    if entity not in TRANSFER_ENTITIES or fmt not in ('csv', 'json'):
+        return render_template('404.html'), 404
+    
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    filename = f"{entity}.{'csv' if fmt == 'csv' else 'jsonl'}"
+    return Response(
+        stream_with_context(export_rows(TRANSFER_ENTITIES[entity], fmt)),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+def _transfer_format(filename):
+    return 'csv' if filename.rsplit('.', 1)[-1].lower() == 'csv' else 'json'
+
+@app.route('/admin/importar/<entity>', methods=['POST'])
+@require_admin
+def admin_import(entity):
+    if entity not in TRANSFER_ENTITIES:
+        return render_template('404.html'), 404
+    
+    file = request.files.get('file')
+    if not file or not file.filename:
+        flash('Selecione um arquivo para importar.', 'error')
+        return redirect(url_for('admin_projects'))
+    
+    fmt = _transfer_format(file.filename)
+    media_file = request.files.get('media_file') if entity == 'projetos' else None
+    
+    try:
+        if media_file and media_file.filename:
+            count, media_count = import_projects_with_media(
+                file.stream, fmt, media_file.stream, _transfer_format(media_file.filename))
+            flash(f'{count} projeto(s) e {media_count} mídia(s) importados com sucesso!', 'success')
+        else:
+            count = import_rows(TRANSFER_ENTITIES[entity], file.stream, fmt)
+            flash(f'{count} registro(s) importado(s) com sucesso!', 'success')
+    except Exception as e:
+        flash('Erro ao importar arquivo. Verifique o formato e tente novamente.', 'error')
+    
+    return redirect(url_for('admin_projects'))
+
+# Chunked, resumable media uploads
+@app.route('/admin/projeto/<int:project_id>/midias', methods=['POST'])
+@require_admin
+def admin_start_media_upload(project_id):
+    Project.query.get_or_404(project_id)
+    data = request.get_json(silent=True) or {}
+    
+    try:
+        state = start_upload(project_id, data.get('filename'), data.get('size'))
+    except UploadError as e:
+        return jsonify({'success': False, 'error': str(e)}), e.status
+    
+    return jsonify({'success': True, **state}), 201
+
+@app.route('/admin/midias/upload/<upload_id>', methods=['GET', 'PUT', 'DELETE'])
+@require_admin
+def admin_media_upload(upload_id):
+    try:
+        if request.method == 'DELETE':
+            cancel_upload(upload_id)
+            return jsonify({'success': True})
+        
+        if request.method == 'GET':
+            return jsonify({'success': True, **upload_status(upload_id)})
+        
+        offset = request.headers.get('Upload-Offset', type=int)
+        if offset is None:
+            return jsonify({'success': False, 'error': 'Cabeçalho Upload-Offset ausente.'}), 400
+        
+        result = write_chunk(upload_id, offset, request.stream)
+    except UploadError as e:
+        return jsonify({'success': False, 'error': str(e), 'offset': e.offset}), e.status
+    
+    if isinstance(result, ProjectMedia):
+        return jsonify({
+            'success': True,
+            'complete': True,
+            'media': {
+                'id': result.id,
+                'url': url_for('serve_media', media_id=result.id),
+                'media_type': result.media_type,
+                'original_filename': result.original_filename,
+                'file_size': result.file_size,
+            }
+        })
+    return jsonify({'success': True, 'complete': False, **result})
+
+@app.route('/admin/midia/<int:media_id>/excluir', methods=['POST'])
+@require_admin
+def admin_delete_media(media_id):
+    media = ProjectMedia.query.get_or_404(media_id)
+    project_id = media.project_id
+    
+    try:
+        delete_media(media)
+        flash('Mídia excluída com sucesso!', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash('Erro ao excluir mídia.', 'error')
+    
+    return redirect(url_for('admin_edit_project', project_id=project_id))
+
 @app.route('/admin/sobre')
 @require_admin
 def admin_about():
     about = AboutPage.query.first()
+    if not about:
+        use_primary()
+        about = AboutPage.query.first()
     if not about:
         about = AboutPage()
         db.session.add(about)
@@ -306,6 +520,9 @@ def admin_about():
 @require_admin
 def admin_save_about():
     about = AboutPage.query.first()
+    if not about:
+        use_primary()
+        about = AboutPage.query.first()
     if not about:
         about = AboutPage()
         db.session.add(about)
@@ -353,6 +570,59 @@ def mark_notification_read(notification_id):
     
     return jsonify({'success': True})
 
+# Mark several notifications as read at once
+@app.route('/admin/notificacoes/ler', methods=['POST'])
+@require_admin
+def admin_mark_notifications_read():
+    data = request.get_json(silent=True)
+    ids = data.get('ids') if isinstance(data, dict) else None
+    if not isinstance(ids, list):
+        return jsonify({'success': False, 'error': 'IDs inválidos'}), 400
+    try:
+        ids = [int(notification_id) for notification_id in ids]
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'IDs inválidos'}), 400
+    
+    updated = mark_notifications_read(ids)
+    
+    return jsonify({'success': True, 'updated': updated})
+
+# Mark every notification as read
+@app.route('/admin/notificacoes/ler-todas', methods=['POST'])
+@require_admin
+def admin_mark_all_notifications_read():
+    updated = mark_notifications_read()
+    flash(f'{updated} notificação(ões) marcada(s) como lida(s).', 'success')
+    
+    return redirect(request.referrer or url_for('admin_notifications'))
+
+# Live notifications and counts for the dashboard (Server-Sent Events)
+@app.route('/admin/eventos')
+@require_admin
+def admin_events():
+    return event_stream(ADMIN_CHANNEL)
+
+# Notification inbox
+@app.route('/admin/notificacoes')
+@require_admin
+def admin_notifications():
+    page = request.args.get('page', 1, type=int)
+    unread_only = request.args.get('status') == 'nao-lidas'
+    
+    query = Notification.query
+    if unread_only:
+        query = query.filter_by(is_read=False)
+    
+    notifications = query.order_by(desc(Notification.created_at)).paginate(
+        page=page, per_page=20, error_out=False
+    )
+    unread_count = Notification.query.filter_by(is_read=False).count()
+    
+    return render_template('admin/notifications.html',
+                         notifications=notifications,
+                         unread_only=unread_only,
+                         unread_count=unread_count)
+
 # ==========================================
 # SIMPLE PROJECT MANAGEMENT ROUTES
 # ==========================================
@@ -384,7 +654,8 @@ def admin_simple_project_create():
     project.description = description
     project.github_url = github_url if github_url else None
     project.is_published = is_published
-    project.slug = create_slug(title)
+    assign_slug(project)
+    prepare_project(project)
     
     # Handle image upload
     if 'image' in request.files:
@@ -423,15 +694,19 @@ def admin_simple_project_edit(project_id):
         flash('Título e descrição são obrigatórios.', 'error')
         return redirect(url_for('admin_simple_projects'))
     
+    # Update slug if title changed
+    title_changed = title != project.title
+    
     # Update project
     project.title = title
     project.description = description
     project.github_url = github_url if github_url else None
     project.is_published = is_published
     
-    # Update slug if title changed
-    if title != project.title:
-        project.slug = create_slug(title)
+    if title_changed:
+        assign_slug(project)
+    
+    prepare_project(project)
     
     # Handle new image upload
     if 'image' in request.files:
@@ -460,10 +735,12 @@ def admin_simple_project_edit(project_id):
 def admin_simple_project_delete(project_id):
     project = Project.query.get_or_404(project_id)
     project_title = project.title
+    media_files = project_media_files([project.id])
     
     try:
         db.session.delete(project)
         db.session.commit()
+        remove_media_files(media_files)
         flash(f'Projeto "{project_title}" excluído com sucesso!', 'success')
     except Exception as e:
         db.session.rollback()
@@ -474,10 +751,15 @@ def admin_simple_project_delete(project_id):
 # Health check for Railway deployment
 @app.route('/health')
 def health_check():
+    replicas = app.extensions.get('replicas')
     return jsonify({
         'status': 'healthy',
         'message': 'Portfolio application is running',
-        'database': 'connected' if db.engine else 'disconnected'
+        'database': 'connected' if db.engine else 'disconnected',
+        'replicas': {
+            'total': len(replicas.engines),
+            'healthy': len(replicas.healthy())
+        } if replicas else None
     })
 
 # Debug route to check admin status
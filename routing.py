@@ -0,0 +1,128 @@
+import itertools
+import logging
+import threading
+import time
+
+import sqlalchemy as sa
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+
+READ_ONLY_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+
+
+class ReplicaPool:
+    """Round-robin over read replicas, skipping the ones that recently failed.
+
+    A replica whose connection fails is taken out of rotation for
+    ``retry_after`` seconds and then tried again; pool_pre_ping catches dead
+    pooled connections before they are handed out.
+    """
+
+    def __init__(self, urls, engine_options, retry_after=30):
+        self.engines = [sa.create_engine(url, **engine_options) for url in urls]
+        self.retry_after = retry_after
+        self._down_until = {}
+        self._cycle = itertools.cycle(range(len(self.engines)))
+        self._lock = threading.Lock()
+        for engine in self.engines:
+            sa.event.listen(engine, 'handle_error', self._on_error)
+
+    def _on_error(self, context):
+        if context.is_disconnect or isinstance(context.sqlalchemy_exception, sa.exc.OperationalError):
+            self.mark_down(context.engine)
+
+    def mark_down(self, engine):
+        logging.warning(f"Read replica {engine.url.render_as_string()} unavailable, using fallback")
+        self._down_until[engine] = time.monotonic() + self.retry_after
+
+    def healthy(self):
+        now = time.monotonic()
+        return [e for e in self.engines if self._down_until.get(e, 0) <= now]
+
+    def _ping(self, engine):
+        try:
+            with engine.connect() as conn:
+                conn.exec_driver_sql('SELECT 1')
+        except sa.exc.DBAPIError:
+            return False
+        self._down_until.pop(engine, None)
+        return True
+
+    def pick(self):
+        """Next healthy replica engine, or None when all of them are down.
+
+        A replica coming back from a failure is pinged before it is used again.
+        """
+        for _ in range(len(self.engines)):
+            with self._lock:
+                engine = self.engines[next(self._cycle)]
+            down_until = self._down_until.get(engine)
+            if down_until is None:
+                return engine
+            if down_until <= time.monotonic() and self._ping(engine):
+                return engine
+        return None
+
+
+class RoutingSession(Session):
+    """Send read-only request traffic to a replica, everything else to primary.
+
+    A request reads from the primary when it is not a GET/HEAD/OPTIONS, and
+    from the moment it writes anything (flush or DML statement) so it always
+    sees its own writes. Sessions used outside a request (CLI commands,
+    background threads) always use the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        primary = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        replicas = current_app.extensions.get('replicas') if has_request_context() else None
+        if bind is not None or replicas is None:
+            return primary
+
+        if self._flushing or isinstance(clause, sa.sql.expression.UpdateBase):
+            g._db_wrote = True
+            return primary
+        if request.method not in READ_ONLY_METHODS or g.get('_db_wrote'):
+            return primary
+
+        # Stick to one replica per request for consistent reads
+        if '_db_replica' not in g:
+            g._db_replica = self._connect_replica(replicas)
+        return g._db_replica or primary
+
+    def _connect_replica(self, replicas):
+        """Open the session's connection to a healthy replica, None if there is none."""
+        for _ in range(len(replicas.engines)):
+            engine = replicas.pick()
+            if engine is None:
+                return None
+            try:
+                self.connection(bind_arguments={'bind': engine})
+            except sa.exc.DBAPIError:
+                # handle_error already took it out of rotation
+                continue
+            return engine
+        return None
+
+
+def use_primary():
+    """Read from the primary for the rest of the request.
+
+    For GET handlers that write based on what they read: a lagging replica
+    could return stale or missing rows.
+    """
+    if has_request_context():
+        g._db_wrote = True
+
+
+def init_replicas(app):
+    """Set up the replica pool from DATABASE_REPLICA_URLS (comma-separated)."""
+    urls = [url.strip() for url in (app.config.get('DATABASE_REPLICA_URLS') or '').split(',') if url.strip()]
+    if not urls:
+        return None
+    urls = [url.replace("postgres://", "postgresql://", 1) if url.startswith("postgres://") else url
+            for url in urls]
+    pool = ReplicaPool(urls, app.config["SQLALCHEMY_ENGINE_OPTIONS"])
+    app.extensions['replicas'] = pool
+    logging.info(f"Routing read-only requests to {len(urls)} replica(s)")
+    return pool
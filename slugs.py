@@ -0,0 +1,134 @@
+import threading
+import time
+
+from sqlalchemy import event, inspect, or_, select, union_all
+from sqlalchemy.orm import Session
+
+from app import app, db
+from models import Project, SlugHistory
+from utils import create_slug
+
+# Per-process slug -> project id map covering current and historical slugs.
+# It is rebuilt after any local commit that touches a slug, and at most every
+# SLUG_MAP_TTL seconds to pick up changes made by other workers.
+_slug_map = None
+_slug_map_built_at = 0
+_slug_map_lock = threading.Lock()
+
+
+def _load_slug_map():
+    global _slug_map, _slug_map_built_at
+    with _slug_map_lock:
+        if _slug_map is None or time.monotonic() - _slug_map_built_at > app.config['SLUG_MAP_TTL']:
+            rows = db.session.execute(union_all(
+                select(Project.slug, Project.id).where(Project.slug.isnot(None)),
+                select(SlugHistory.slug, SlugHistory.project_id),
+            )).all()
+            _slug_map = dict(rows)
+            _slug_map_built_at = time.monotonic()
+        return _slug_map
+
+
+def invalidate_slugs():
+    """Drop the slug map; call after writes that bypass the ORM (bulk statements)."""
+    global _slug_map
+    _slug_map = None
+
+
+def lookup_project(slug, **filters):
+    """Find the project for ``slug``, following old slugs.
+
+    Returns the project (or None). Callers should redirect when
+    ``project.slug != slug``, which means an old URL was used.
+    """
+    project_id = _load_slug_map().get(slug)
+    if project_id is not None:
+        project = Project.query.filter_by(id=project_id, **filters).first()
+        if project is not None:
+            return project
+
+    # Not in the map, or the map is stale: ask the database
+    project = Project.query.filter_by(slug=slug, **filters).first()
+    if project is None:
+        project = (Project.query.filter_by(**filters)
+                   .join(SlugHistory, SlugHistory.project_id == Project.id)
+                   .filter(SlugHistory.slug == slug).first())
+    if project is not None:
+        _load_slug_map()[slug] = project.id
+    return project
+
+
+def unique_slug(base, taken, next_suffix=None):
+    """Return ``base`` or the first free ``base-N`` not in ``taken``, and reserve it.
+
+    When many slugs come from one base (bulk imports), pass the same
+    ``next_suffix`` dict on every call: it remembers where each base's
+    search stopped, so the suffixes are not probed from 2 again each time.
+    """
+    slug = base
+    suffix = 2 if next_suffix is None else next_suffix.get(base, 2)
+    while slug in taken:
+        slug = f"{base}-{suffix}"
+        suffix += 1
+    if next_suffix is not None:
+        next_suffix[base] = suffix
+    taken.add(slug)
+    return slug
+
+
+def _slug_candidates(column, base):
+    return or_(column == base, column.startswith(f'{base}-', autoescape=True))
+
+
+def generate_unique_slug(title, project_id=None):
+    """Slug for ``title`` that no other project uses now or used before.
+
+    All candidates (``base`` and ``base-*``) are fetched in a single query.
+    """
+    base = create_slug(title) or 'projeto'
+    taken = set(db.session.scalars(union_all(
+        select(Project.slug).where(_slug_candidates(Project.slug, base), Project.id != project_id),
+        select(SlugHistory.slug).where(_slug_candidates(SlugHistory.slug, base),
+                                       SlugHistory.project_id != project_id),
+    )))
+    return unique_slug(base, taken)
+
+
+def assign_slug(project):
+    """Give ``project`` a unique slug for its title, keeping the old one as a redirect."""
+    old_slug = project.slug
+    new_slug = generate_unique_slug(project.title, project.id)
+    if new_slug == old_slug:
+        return
+
+    if project.id is not None:
+        # Reusing one of its own old slugs: it is current again
+        SlugHistory.query.filter_by(project_id=project.id, slug=new_slug).delete()
+        if old_slug:
+            history = SlugHistory()
+            history.slug = old_slug
+            history.project_id = project.id
+            db.session.add(history)
+    project.slug = new_slug
+
+
+@event.listens_for(Session, 'after_flush')
+def _track_slug_changes(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, SlugHistory) or (
+            isinstance(obj, Project) and (obj in session.new or obj in session.deleted
+                                          or inspect(obj).attrs.slug.history.has_changes())
+        ):
+            session.info['slugs_changed'] = True
+            return
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    if session.info.pop('slugs_changed', False):
+        invalidate_slugs()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_slug_changes(session):
+    session.info.pop('slugs_changed', None)
@@ -551,6 +551,40 @@ function initializeProgressIndicators() {
     });
 }
 
+/**
+ * Notification Read Queue - Batch "mark as read" requests into one POST
+ */
+const pendingNotificationReads = new Set();
+let notificationReadTimer = null;
+
+function queueNotificationRead(notificationId) {
+    pendingNotificationReads.add(Number(notificationId));
+    clearTimeout(notificationReadTimer);
+    notificationReadTimer = setTimeout(flushNotificationReads, 1000);
+}
+
+function flushNotificationReads() {
+    if (pendingNotificationReads.size === 0) return;
+    
+    const ids = Array.from(pendingNotificationReads);
+    pendingNotificationReads.clear();
+    
+    fetch('/admin/notificacoes/ler', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ ids: ids }),
+        keepalive: true
+    })
+    .catch(error => {
+        console.error('Error:', error);
+    });
+}
+
+// Don't lose queued reads when leaving the page
+window.addEventListener('pagehide', flushNotificationReads);
+
 // Initialize additional features when DOM is ready
 document.addEventListener('DOMContentLoaded', function() {
     initializeLikeButtons();
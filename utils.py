@@ -1,7 +1,10 @@
+import logging
 import re
+import threading
+import time
 import unicodedata
 from models import Notification
-from app import db
+from app import app, db
 
 def allowed_file(filename):
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'svg', 'mp4', 'webm', 'pdf'}
@@ -27,3 +30,30 @@ def create_notification(title, message, notification_type='general', related_pro
     notification.related_user_id = related_user_id
     db.session.add(notification)
     return notification
+
+def warm_templates(app):
+    """Load and compile every template so the first requests don't pay for it"""
+    start = time.perf_counter()
+    names = app.jinja_env.list_templates(extensions=['html'])
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names), time.perf_counter() - start
+
+def start_periodic_task(name, interval, task, description):
+    """Call ``task`` every ``interval`` seconds in a daemon thread, inside an app context.
+
+    A failing run is logged and its session rolled back; the next one goes ahead as usual.
+    """
+    def run():
+        while True:
+            time.sleep(interval)
+            with app.app_context():
+                try:
+                    task()
+                except Exception:
+                    db.session.rollback()
+                    logging.exception(f"{description} failed")
+
+    thread = threading.Thread(target=run, name=name, daemon=True)
+    thread.start()
+    return thread